@@ -1,10 +1,11 @@
+import os
+
 import streamlit as st
-import streamlit_authenticator as stauth
-import yaml
 from dotenv import load_dotenv
 from st_pages import Page, Section, add_indentation, show_pages
 
 from utils.data import init_connection
+from utils.shared_cache import get_shared_cache
 from utils.utils import hide_streamlit_elements
 
 load_dotenv()
@@ -13,6 +14,10 @@ hide_streamlit_elements()
 
 
 def init_login():
+    # Only needed by the login form, kept off the worker start
+    import streamlit_authenticator as stauth
+    import yaml
+
     with open("login.yaml") as file:
         config = yaml.load(file, Loader=yaml.SafeLoader)
 
@@ -26,6 +31,14 @@ def init_login():
     return authenticator
 
 
+def start_api_server(db):
+    # The API pulls the whole data stack, it is only imported when served
+    if os.environ.get("API_PORT", "0") != "0":
+        from utils.api import ensure_api_server
+
+        ensure_api_server(db)
+
+
 def config_pages():
     add_indentation()
     show_pages(
@@ -48,22 +61,38 @@ def config_pages():
                 "Edit player details",
                 "🔧",
             ),
+            Page(
+                "pages_experimental/8_Performance.py",
+                "Performance",
+                "⏱️",
+            ),
         ]
     )
 
 
 def main():
+    # The snapshots pull polars and the data stack, Home only starts them
+    from utils.snapshots import is_ready, start_prewarm
+
     config_pages()
 
     db = init_connection()
     st.session_state["db"] = db
+    start_api_server(db)
 
     reload_data_btn = st.button("Reload data")
     if reload_data_btn:
+        shared = get_shared_cache()
+        if shared is not None:
+            # Other replicas stop reading the entries stored before the reload
+            shared.bump_generation()
         st.experimental_singleton.clear()
+    start_prewarm(db)
 
     st.write("# Home page")
     st.write("#### Welcome to the BFF dashboard")
+    if not is_ready(db):
+        st.info("The league data is being prepared, pages may be slow for a moment")
 
     authenticator = init_login()
     authenticator.login("Admin login", "main")
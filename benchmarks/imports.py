@@ -0,0 +1,112 @@
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+from dataclasses import asdict, dataclass
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+PAGES = ["Home.py"] + sorted(
+    str(p.relative_to(ROOT)) for p in (ROOT / "pages_experimental").glob("*.py")
+)
+
+# Runs the module level code of a page, main() is guarded by __name__
+SCRIPT = """
+import pkgutil, runpy, sys, time
+sys.stderr.write("{marker}\\n")
+start = time.perf_counter()
+runpy.run_path({path!r}, run_name="import_bench")
+print(time.perf_counter() - start)
+"""
+
+START_MARKER = "import bench start"
+IMPORT_TIME_LINE = re.compile(r"import time:\s+(\d+) \|\s+(\d+) \| (\s*)(\S+)")
+
+
+@dataclass
+class ImportResult:
+    page: str
+    repeat: int
+    best: float
+    median: float
+    modules: dict[str, float]
+
+
+def parse_import_time(stderr: str) -> dict[str, float]:
+    # Cumulative time of the top level imports, nested ones are indented
+    modules = {}
+    stderr = stderr.split(START_MARKER, 1)[-1]
+    for match in IMPORT_TIME_LINE.finditer(stderr):
+        _, cumulative, indent, name = match.groups()
+        if indent == "":
+            modules[name] = int(cumulative) / 1e6
+    return modules
+
+
+def measure_page(page: str, repeat: int) -> ImportResult:
+    timings, runs = [], []
+    for _ in range(repeat):
+        process = subprocess.run(
+            [
+                sys.executable,
+                "-X",
+                "importtime",
+                "-c",
+                SCRIPT.format(path=page, marker=START_MARKER),
+            ],
+            cwd=ROOT,
+            capture_output=True,
+            text=True,
+            check=True,
+        )
+        timings.append(float(process.stdout.strip().splitlines()[-1]))
+        runs.append(parse_import_time(process.stderr))
+    best = min(range(repeat), key=lambda i: timings[i])
+    return ImportResult(
+        page=page,
+        repeat=repeat,
+        best=timings[best],
+        median=statistics.median(timings),
+        modules=runs[best],
+    )
+
+
+def print_result(result: ImportResult, top: int):
+    print(
+        f"{result.page:<45} best {1000 * result.best:8.1f} ms"
+        + f"   median {1000 * result.median:8.1f} ms"
+    )
+    modules = sorted(result.modules.items(), key=lambda m: -m[1])
+    for name, duration in modules[:top]:
+        print(f"    {name:<41} {1000 * duration:8.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the import time of pages")
+    parser.add_argument("--pages", nargs="*", default=PAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--top", type=int, default=5)
+    parser.add_argument("--budget", type=float, help="Milliseconds allowed per page")
+    parser.add_argument("--output", type=Path)
+    args = parser.parse_args()
+
+    results = []
+    for page in args.pages:
+        result = measure_page(page, args.repeat)
+        print_result(result, args.top)
+        results.append(result)
+
+    if args.output is not None:
+        args.output.write_text(json.dumps([asdict(r) for r in results], indent=2))
+    if args.budget is not None:
+        over = [r for r in results if 1000 * r.median > args.budget]
+        for result in over:
+            print(f"OVER BUDGET {result.page}: {1000 * result.median:.1f} ms")
+        if len(over) > 0:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
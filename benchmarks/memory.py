@@ -0,0 +1,52 @@
+import argparse
+import time
+
+from pympler import asizeof
+
+from benchmarks.synthetic import SIZES, generate_league
+from utils.compact import compact_matches
+from utils.utils import get_info_match, get_nick_index, get_statsheet_list
+
+
+def check_equivalent(matches, compact, players):
+    nick_index = get_nick_index(players)
+    for m, c in zip(matches, compact):
+        if get_info_match(m) != get_info_match(c):
+            raise AssertionError(f"Match {m.id} info differs")
+        sheets = get_statsheet_list(players, m, nick_index)
+        compact_sheets = get_statsheet_list(players, c, nick_index)
+        if [(s.player_name, s.cs) for s in sheets] != [
+            (s.player_name, s.cs) for s in compact_sheets
+        ]:
+            raise AssertionError(f"Match {m.id} sheets differ")
+
+
+def measure_size(size: str):
+    league = generate_league(SIZES[size])
+    pydantic_bytes = asizeof.asizeof(league.matches)
+
+    start = time.perf_counter()
+    compact = compact_matches(league.matches)
+    conversion = time.perf_counter() - start
+    compact_bytes = asizeof.asizeof(compact)
+
+    check_equivalent(league.matches, compact, league.players)
+    print(
+        f"{size:<8} {len(league.matches):>6} matches {league.nb_player_stats:>8} stats"
+        + f"   prisma {pydantic_bytes / 2**20:8.2f} MiB"
+        + f"   compact {compact_bytes / 2**20:8.2f} MiB"
+        + f"   x{pydantic_bytes / compact_bytes:.2f}"
+        + f"   conversion {1000 * conversion:8.1f} ms"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure the cached matches size")
+    parser.add_argument("--sizes", default="small,medium,large")
+    args = parser.parse_args()
+    for size in args.sizes.split(","):
+        measure_size(size)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import argparse
+import gc
+import json
+import statistics
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Optional
+
+from benchmarks.synthetic import SIZES, SyntheticLeague, generate_league
+from utils.compact import compact_matches
+from utils.league_calendar import LeagueCalendar
+from utils.standings import build_match_db
+from utils.stats import build_stats_table
+from utils.summary import build_match_summary
+from utils.timeline import get_goal_timeline
+from utils.utils import get_info_match, get_nick_index, get_statsheet_list, sum_sheets
+
+
+@dataclass
+class BenchResult:
+    size: str
+    name: str
+    repeat: int
+    best: float
+    median: float
+    peak_memory: int
+
+
+def measure(fn: Callable, repeat: int) -> tuple[list[float], int]:
+    timings = []
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        fn()
+        timings.append(time.perf_counter() - start)
+
+    gc.collect()
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return timings, peak
+
+
+def get_cases(league: SyntheticLeague) -> dict[str, Callable]:
+    # Same representation as the matches cached by utils.data
+    players, matches = league.players, compact_matches(league.matches)
+    nick_index = get_nick_index(players)
+    sheets = [s for m in matches for s in get_statsheet_list(players, m, nick_index)]
+    calendar = LeagueCalendar(matches)
+    played = [m for m in matches if len(m.periods) > 0]
+
+    def run_standings():
+        for division in league.divisions:
+            matchdays = calendar.matchdays(division.id)
+            build_match_db(calendar, division, (0, len(matchdays) - 1))
+
+    return {
+        "get_statsheet_list": lambda: [get_statsheet_list(players, m) for m in matches],
+        "get_statsheet_list (shared index)": lambda: [
+            get_statsheet_list(players, m, nick_index) for m in matches
+        ],
+        "sum_sheets": lambda: sum_sheets(list(sheets)),
+        "get_info_match": lambda: [get_info_match(m) for m in played],
+        "get_goal_timeline": lambda: [get_goal_timeline(m, players) for m in played],
+        "build_match_summary": lambda: build_match_summary(matches),
+        "LeagueCalendar": lambda: LeagueCalendar(matches),
+        "build_match_db (standings)": run_standings,
+        "build_stats_table": lambda: build_stats_table(sheets, False),
+        "build_stats_table (normalized)": lambda: build_stats_table(sheets, True),
+    }
+
+
+def run_size(
+    size: str, repeat: int, only: Optional[list[str]] = None
+) -> list[BenchResult]:
+    league = generate_league(SIZES[size])
+    print(
+        f"## {size}: {len(league.matches)} matches, {league.nb_periods} periods, "
+        + f"{league.nb_player_stats} player stats, {len(league.players)} players"
+    )
+    results = []
+    for name, fn in get_cases(league).items():
+        if only and not any(o in name for o in only):
+            continue
+        timings, peak = measure(fn, repeat)
+        result = BenchResult(
+            size,
+            name,
+            repeat,
+            min(timings),
+            statistics.median(timings),
+            peak,
+        )
+        print(
+            f"{name:<36} best {1000 * result.best:9.2f} ms"
+            + f"   median {1000 * result.median:9.2f} ms"
+            + f"   peak {result.peak_memory / 2**20:8.2f} MiB"
+        )
+        results.append(result)
+    return results
+
+
+def compare(results: list[BenchResult], baseline_path: Path, threshold: float):
+    baseline = {
+        (r["size"], r["name"]): r for r in json.loads(baseline_path.read_text())
+    }
+    regressions = []
+    for result in results:
+        base = baseline.get((result.size, result.name))
+        if base is None:
+            continue
+        ratio = result.median / base["median"] if base["median"] > 0 else 1.0
+        if ratio > 1 + threshold:
+            regressions.append(f"{result.size} {result.name}: x{ratio:.2f}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the dashboard hot paths")
+    parser.add_argument("--sizes", default="small,medium,large")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--only", nargs="*")
+    parser.add_argument("--output", type=Path)
+    parser.add_argument("--baseline", type=Path)
+    parser.add_argument("--threshold", type=float, default=0.2)
+    args = parser.parse_args()
+
+    results = []
+    for size in args.sizes.split(","):
+        results.extend(run_size(size, args.repeat, args.only))
+
+    if args.output is not None:
+        args.output.write_text(json.dumps([asdict(r) for r in results], indent=2))
+    if args.baseline is not None:
+        regressions = compare(results, args.baseline, args.threshold)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        if len(regressions) > 0:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
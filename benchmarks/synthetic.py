@@ -0,0 +1,278 @@
+import random
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+
+from prisma.models import (
+    Goal,
+    GoalDetail,
+    LeagueDivision,
+    LeagueMatch,
+    LeagueMatchDetail,
+    LeaguePlayer,
+    LeaguePlayerTeams,
+    LeagueTeam,
+    Period,
+    Player,
+    PlayerStats,
+)
+
+PERIOD_GAMETIME = 7 * 60
+
+
+@dataclass(frozen=True)
+class LeagueConfig:
+    divisions: int = 2
+    teams_per_division: int = 8
+    players_per_team: int = 6
+    nicks_per_player: int = 2
+    periods_per_match: int = 2
+    players_per_period: int = 6
+    played_ratio: float = 0.75
+    unknown_ratio: float = 0.05
+    seed: int = 0
+
+
+SIZES = {
+    "small": LeagueConfig(divisions=1, teams_per_division=6),
+    "medium": LeagueConfig(divisions=3, teams_per_division=10),
+    "large": LeagueConfig(divisions=6, teams_per_division=16, players_per_team=8),
+}
+
+
+@dataclass
+class SyntheticLeague:
+    config: LeagueConfig
+    divisions: list[LeagueDivision]
+    teams: list[LeagueTeam]
+    players: list[LeaguePlayer]
+    matches: list[LeagueMatch]
+
+    @property
+    def nb_periods(self) -> int:
+        return sum(len(m.periods) for m in self.matches)
+
+    @property
+    def nb_player_stats(self) -> int:
+        return sum(len(p.PlayerStats) for m in self.matches for p in m.periods)
+
+
+def get_round_robin(nb_teams: int) -> list[list[tuple[int, int]]]:
+    # Circle method, the second half swaps home and away
+    teams = list(range(nb_teams + nb_teams % 2))
+    rounds = []
+    for _ in range(len(teams) - 1):
+        half = len(teams) // 2
+        pairs = [
+            (teams[i], teams[-i - 1])
+            for i in range(half)
+            if teams[i] < nb_teams and teams[-i - 1] < nb_teams
+        ]
+        rounds.append(pairs)
+        teams = [teams[0], teams[-1]] + teams[1:-1]
+    return rounds + [[(b, a) for a, b in pairs] for pairs in rounds]
+
+
+def build_player_stats(
+    rng: random.Random,
+    stats_id: str,
+    period_id: int,
+    player: Player,
+    goals: int,
+) -> PlayerStats:
+    passes = rng.randint(10, 60)
+    return PlayerStats(
+        id=stats_id,
+        periodId=period_id,
+        Player=player,
+        playerId=player.id,
+        gametime=float(rng.randint(PERIOD_GAMETIME - 60, PERIOD_GAMETIME + 30)),
+        goals=goals,
+        ownGoals=int(rng.random() < 0.03),
+        assists=rng.randint(0, 2),
+        secondaryAssists=rng.randint(0, 1),
+        tertiaryAssists=rng.randint(0, 1),
+        shots=goals + rng.randint(0, 5),
+        shotsTarget=goals + rng.randint(0, 2),
+        saves=rng.randint(0, 6),
+        touches=rng.randint(20, 120),
+        kicks=rng.randint(10, 80),
+        interceptions=rng.randint(0, 10),
+        clears=rng.randint(0, 10),
+        duels=rng.randint(0, 15),
+        reboundDribbles=rng.randint(0, 5),
+        passesAttempted=passes,
+        passesSuccessful=rng.randint(passes // 2, passes),
+        goalsScoredTeam=0,
+        goalsConcededTeam=0,
+        averagePosX=rng.uniform(-600, 600),
+        averagePosY=rng.uniform(-250, 250),
+        gamePosition=rng.randint(1, 3),
+    )
+
+
+def build_period(
+    rng: random.Random,
+    config: LeagueConfig,
+    period_id: int,
+    match_id: int,
+    rosters: tuple[list[LeaguePlayer], list[LeaguePlayer]],
+) -> Period:
+    per_side = config.players_per_period // 2
+    score = [rng.randint(0, 5), rng.randint(0, 5)]
+    players, stats = [], []
+    for side in (1, 2):
+        roster = rng.sample(rosters[side - 1], min(per_side, len(rosters[side - 1])))
+        for i, lp in enumerate(roster):
+            if rng.random() < config.unknown_ratio:
+                name = f"guest_{period_id}_{side}_{i}"
+            else:
+                name = rng.choice(lp.nicks)
+            player = Player(
+                id=f"{period_id}-{side}-{i}",
+                auth=f"auth-{lp.id}",
+                conn=f"conn-{lp.id}",
+                name=name,
+                team=side,
+                goalDetail=[],
+            )
+            players.append(player)
+            stats.append(
+                build_player_stats(
+                    rng, f"{player.id}-s", period_id, player, score[side - 1] // 2
+                )
+            )
+
+    for stats_player in stats:
+        side = stats_player.Player.team
+        stats_player.goalsScoredTeam = score[side - 1]
+        stats_player.goalsConcededTeam = score[2 - side]
+
+    for g in range(sum(score)):
+        side = 1 if g < score[0] else 2
+        side_players = [p for p in players if p.team == side]
+        goal = Goal(
+            id=f"{period_id}-g{g}",
+            time=float(rng.randint(0, PERIOD_GAMETIME)),
+            passes=rng.randint(0, 6),
+        )
+        for role, player in enumerate(
+            rng.sample(side_players, min(2, len(side_players)))
+        ):
+            player.goalDetail.append(
+                GoalDetail(
+                    goal=goal,
+                    goalId=goal.id,
+                    playerId=player.id,
+                    role=role + 1,
+                    own=False,
+                )
+            )
+
+    return Period(
+        id=period_id,
+        gametime=float(PERIOD_GAMETIME),
+        scoreRed=score[0],
+        scoreBlue=score[1],
+        possessionRed=rng.randint(30, 70),
+        possessionBlue=rng.randint(30, 70),
+        actionZoneRed=rng.randint(30, 70),
+        actionZoneBlue=rng.randint(30, 70),
+        PlayerStats=stats,
+        leagueMatchId=match_id,
+    )
+
+
+def generate_league(config: LeagueConfig) -> SyntheticLeague:
+    rng = random.Random(config.seed)
+    start = datetime(2023, 1, 1)
+    divisions, teams, players, matches = [], [], [], []
+    period_id = 1
+
+    for d in range(config.divisions):
+        division = LeagueDivision(id=d + 1, name=f"Division {d + 1}", teams=[])
+        divisions.append(division)
+        div_teams, rosters = [], []
+        for t in range(config.teams_per_division):
+            team = LeagueTeam(
+                id=len(teams) + 1,
+                division=division,
+                leagueDivisionId=division.id,
+                name=f"D{d + 1} Team {t + 1}",
+                initials=f"D{d + 1}T{t + 1}",
+                players=[],
+            )
+            roster = []
+            for _ in range(config.players_per_team):
+                player_id = len(players) + 1
+                player = LeaguePlayer(
+                    id=player_id,
+                    name=f"Player {player_id}",
+                    nicks=[
+                        f"nick_{player_id}_{n}" for n in range(config.nicks_per_player)
+                    ],
+                    teams=[],
+                )
+                link = LeaguePlayerTeams(
+                    player=player,
+                    leaguePlayerId=player.id,
+                    team=team,
+                    leagueTeamId=team.id,
+                    active=True,
+                )
+                player.teams.append(link)
+                team.players.append(link)
+                players.append(player)
+                roster.append(player)
+            teams.append(team)
+            div_teams.append(team)
+            rosters.append(roster)
+        division.teams = div_teams
+
+        rounds = get_round_robin(config.teams_per_division)
+        nb_played = round(len(rounds) * config.played_ratio)
+        for r, pairs in enumerate(rounds):
+            for game, (home, away) in enumerate(pairs):
+                match_id = len(matches) + 1
+                match = LeagueMatch(
+                    id=match_id,
+                    date=start + timedelta(days=7 * r),
+                    matchday=str(r + 1),
+                    gameNumber=game + 1,
+                    title=f"MD {r + 1} - {div_teams[home].name} vs "
+                    + div_teams[away].name,
+                    LeagueDivision=division,
+                    leagueDivisionId=division.id,
+                    periods=[],
+                    defwin=0,
+                    addRed=0,
+                    addBlue=0,
+                    replayURL="",
+                    detail=[],
+                    version=0,
+                )
+                starts_red = rng.random() < 0.5
+                for team_idx, is_home in [(home, True), (away, False)]:
+                    match.detail.append(
+                        LeagueMatchDetail(
+                            leagueMatchId=match_id,
+                            team=div_teams[team_idx],
+                            leagueTeamId=div_teams[team_idx].id,
+                            home=is_home,
+                            startsRed=starts_red == is_home,
+                        )
+                    )
+                if r < nb_played:
+                    for _ in range(config.periods_per_match):
+                        match.periods.append(
+                            build_period(
+                                rng,
+                                config,
+                                period_id,
+                                match_id,
+                                (rosters[home], rosters[away]),
+                            )
+                        )
+                        period_id += 1
+                matches.append(match)
+
+    return SyntheticLeague(config, divisions, teams, players, matches)
@@ -3,7 +3,16 @@ from prisma import Prisma
 from prisma.models import LeagueDivision, LeaguePlayer, LeagueTeam
 from st_pages import add_indentation
 
-from utils.data import get_divisions, get_teams, init_connection
+from utils.audit import sync_changes
+from utils.data import (
+    get_divisions,
+    get_season_divisions,
+    get_season_teams,
+    get_teams,
+    init_connection,
+)
+from utils.metrics import timed
+from utils.seasons import get_season_id, get_season_name, select_season
 from utils.utils import hide_streamlit_elements
 
 hide_streamlit_elements()
@@ -18,7 +27,9 @@ def select_team(teams: list[LeagueTeam], divisions: list[LeagueDivision]):
         team_options = [t.name for t in teams if t.division.name in div_select]
         team_options.sort()
         team_select = st.selectbox("Team", team_options)
-    team_list = [t for t in teams if t.name == team_select]
+    team_list = [
+        t for t in teams if t.name == team_select and t.division.name == div_select
+    ]
     if len(team_list) == 0:
         return None
     return team_list[0]
@@ -52,10 +63,13 @@ def main():
 
     db: Prisma = st.session_state["db"]
 
-    teams_list = get_teams(db)
-    divisions_list = get_divisions(db)
+    season = select_season(db)
+    with timed("teams.load"):
+        sync_changes(db)
+        teams_list = get_season_teams(get_teams(db), get_season_id(season))
+        divisions_list = get_season_divisions(get_divisions(db), get_season_id(season))
 
-    st.write("# S10 teams")
+    st.write(f"# {get_season_name(season)} teams")
 
     team = select_team(teams_list, divisions_list)
     if team is None:
@@ -63,8 +77,9 @@ def main():
 
     st.write(f"## {team.name}")
 
-    display_active_players(team)
-    display_former_players(team)
+    with timed("teams.render", rows=len(team.players)):
+        display_active_players(team)
+        display_former_players(team)
 
 
 if __name__ == "__main__":
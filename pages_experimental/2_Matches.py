@@ -1,61 +1,40 @@
-from typing import Optional
-
-import pandas as pd
 import streamlit as st
 from prisma import Prisma
-from prisma.models import LeagueMatch
 from st_aggrid import AgGrid
 from st_aggrid.grid_options_builder import GridOptionsBuilder
 from st_pages import add_indentation
 
-from utils.data import get_divisions, get_matches, get_teams, init_connection
-from utils.utils import get_info_match, get_unique_order, hide_streamlit_elements
+from utils.audit import sync_changes
+from utils.data import (
+    get_divisions,
+    get_season_divisions,
+    get_season_teams,
+    get_teams,
+    init_connection,
+)
+from utils.league_calendar import LeagueCalendar
+from utils.metrics import timed
+from utils.paging import paginate_table
+from utils.seasons import (
+    get_season_id,
+    get_season_name,
+    get_season_snapshot,
+    select_season,
+)
+from utils.summary import SUMMARY_COLUMNS
+from utils.utils import hide_streamlit_elements
 
 hide_streamlit_elements()
 add_indentation()
 
 
-def filter_matches(
-    matches: list[LeagueMatch],
-    team_name: Optional[str],
-    division_name: str,
-    matchday_select: Optional[str],
-):
-    match_list_filter = []
-    for m in matches:
-        if matchday_select is not None and m.matchday != matchday_select:
-            continue
-        if m.LeagueDivision.name != division_name:
-            continue
-        if team_name is None or any([md.team.name == team_name for md in m.detail]):
-            match_list_filter.append(m)
-    return match_list_filter
-
-
-def build_match_db(match_list: list[LeagueMatch]):
-    object_list = []
-    for m in match_list:
-        info_match = get_info_match(m)
-        score = f"{info_match.score[0]}-{info_match.score[1]}"
-        team1 = ""
-        if len(m.detail) > 0:
-            team1 = m.detail[0].team.name
-        team2 = ""
-        if len(m.detail) > 1:
-            team2 = m.detail[1].team.name
-        if info_match.score[0] == -1:
-            score = ""
-        obj = {
-            "division": m.LeagueDivision.name,
-            "matchday": m.matchday,
-            "date": m.date,
-            "team1": team1,
-            "team2": team2,
-            "score": score,
-        }
-        object_list.append(obj)
-    object_df = pd.DataFrame([dict(s) for s in object_list])
-    return object_df
+def get_pagination(calendar: LeagueCalendar, division_id: int, use_team_filter: bool):
+    matchdays = calendar.matchdays(division_id)
+    if len(matchdays) == 0:
+        return 1
+    if use_team_filter:
+        return len(matchdays) / 2
+    return len(calendar.matches_on(division_id, matchdays[0]))
 
 
 def main():
@@ -65,29 +44,15 @@ def main():
 
     db: Prisma = st.session_state["db"]
 
-    matches_list = get_matches(db)
-    teams_list = get_teams(db)
-    divisions_list = get_divisions(db)
-
-    matchday_options = {
-        div.id: get_unique_order(
-            [m.matchday for m in matches_list if m.leagueDivisionId == div.id]
-        )
-        for div in divisions_list
-    }
-
-    pagination_division = {}
-    for div in divisions_list:
-        first_md: str = matchday_options[div.id][0]
-        matches_div = [m for m in matches_list if div.id == m.leagueDivisionId]
-        pagination_div = len([m for m in matches_div if m.matchday == first_md])
-        pagination_division[div.id] = pagination_div
-
-    pagination_team = {
-        div.id: len(matchday_options[div.id]) / 2 for div in divisions_list
-    }
+    season = select_season(db)
+    with timed("matches.load"):
+        sync_changes(db)
+        snapshot = get_season_snapshot(db, season)
+        summary, calendar = snapshot.summary, snapshot.calendar
+        teams_list = get_season_teams(get_teams(db), get_season_id(season))
+        divisions_list = get_season_divisions(get_divisions(db), get_season_id(season))
 
-    st.write("# S10 matches")
+    st.write(f"# {get_season_name(season)} matches")
 
     col1, col2, col3 = st.columns([3, 2, 9])
     with col1:
@@ -115,18 +80,23 @@ def main():
     with col2:
         matchday_select = col2.select_slider(
             "Matchday",
-            options=matchday_options[div_select.id],
+            options=calendar.matchdays(div_select.id),
             disabled=(not filter_by_md),
         )
         if not filter_by_md:
             matchday_select = None
 
-    match_list_filter = filter_matches(
-        matches_list, team_select, div_name_select, matchday_select
-    )
+    with timed("matches.filter") as t:
+        df = summary.lookup(div_select.id, team_select, matchday_select).select(
+            SUMMARY_COLUMNS
+        )
+        t.add_rows(len(df))
+    pagination_nb = get_pagination(calendar, div_select.id, use_team_filter)
+    df_page = paginate_table(
+        df, "matches", default_page_size=max(1, int(pagination_nb))
+    ).to_pandas()
 
-    df = build_match_db(match_list_filter)
-    gb = GridOptionsBuilder.from_dataframe(df)
+    gb = GridOptionsBuilder.from_dataframe(df_page)
     gb.configure_default_column()
     gb.configure_column(
         "date",
@@ -134,21 +104,11 @@ def main():
         custom_format_string="dd/MM/yy",
         pivot=True,
     )
-
-    if use_team_filter:
-        pagination_nb = pagination_team[div_select.id]
-    else:
-        pagination_nb = pagination_division[div_select.id]
-
-    gb.configure_pagination(
-        enabled=True,
-        paginationAutoPageSize=False,
-        paginationPageSize=pagination_nb,
-    )
     gb.configure_grid_options()
     grid_options = gb.build()
 
-    AgGrid(df, gridOptions=grid_options, fit_columns_on_grid_load=True)
+    with timed("matches.render", rows=len(df_page)):
+        AgGrid(df_page, gridOptions=grid_options, fit_columns_on_grid_load=True)
 
 
 if __name__ == "__main__":
@@ -1,23 +1,31 @@
-import copy
+from typing import Optional
 
 import streamlit as st
 from prisma import Prisma
 from prisma.models import LeagueDivision, LeagueMatch, LeaguePlayer, LeagueTeam
 from st_pages import add_indentation
 
+from utils.audit import sync_changes
 from utils.data import (
     get_divisions,
-    get_matches,
     get_players,
+    get_season_divisions,
+    get_season_teams,
     get_teams,
     init_connection,
 )
+from utils.league_calendar import LeagueCalendar
+from utils.metrics import timed
+from utils.seasons import get_season_id, get_season_snapshot, select_season
+from utils.sheets import get_sheet_store
+from utils.stats import CARD_STATS, format_stat, stat_value
+from utils.timeline import get_goal_timeline_cached
 from utils.utils import (
-    GamePosition,
+    MatchPeriodView,
     PlayerStatSheet,
     display_gametime,
     get_info_match,
-    get_statsheet_list,
+    get_period_views,
     hide_streamlit_elements,
     sum_sheets,
 )
@@ -28,16 +36,9 @@ add_indentation()
 
 def select_match(
     divisions: list[LeagueDivision],
-    matches: list[LeagueMatch],
+    calendar: LeagueCalendar,
     teams: list[LeagueTeam],
 ):
-    matchday_options = {
-        div.id: list(
-            dict.fromkeys([m.matchday for m in matches if m.leagueDivisionId == div.id])
-        )
-        for div in divisions
-    }
-
     col1, col2, col3 = st.columns([3, 2, 9])
     with col1:
         div_name_list = [d.name for d in divisions]
@@ -55,15 +56,12 @@ def select_match(
         team_options.sort()
         team_select = st.selectbox("Team", team_options)
 
-    matchdays_options_div = matchday_options[div_select.id]
+    matchdays_options_div = calendar.matchdays(div_select.id)
     matchday_select = st.select_slider("Matchday", options=matchdays_options_div)
+    match_ids = calendar.matches_on(div_select.id, matchday_select)
 
     match_list_filter: list[LeagueMatch] = []
-    for m in matches:
-        if m.matchday != matchday_select:
-            continue
-        if m.LeagueDivision.name != div_name_select:
-            continue
+    for m in calendar.get_matches(match_ids):
         if len(m.periods) == 0:
             continue
         if team_select is None or any([md.team.name == team_select for md in m.detail]):
@@ -76,33 +74,12 @@ def select_match(
     return match_list[0]
 
 
-def display_statsheet(statsheet: PlayerStatSheet):
+def display_statsheet(statsheet: PlayerStatSheet, nb_cols: int = 4):
     st.write(f"### {statsheet.player_name}")
-    col1, col2, col3, col4 = st.columns(4)
-    ss = statsheet.stats
-
-    col1.metric("Gametime", display_gametime(ss.gametime))
-    col2.metric("Position", GamePosition(ss.gamePosition).name)
-    col3.metric("Goals", ss.goals)
-    col4.metric("Assists", ss.assists)
-
-    col1.metric("Assists (2)", ss.secondaryAssists)
-    col2.metric("Assists (3)", ss.tertiaryAssists)
-    col3.metric("Passes", ss.passesAttempted)
-    col4.metric(
-        "Pass success %",
-        f"{ss.passesSuccessful / (ss.passesAttempted or 1) * 100:.1f}%",
-    )
-
-    col1.metric("Touches", ss.touches)
-    col2.metric("Kicks", ss.kicks)
-    col3.metric("Saves", ss.saves)
-    col4.metric("CS", statsheet.cs)
-
-    col1.metric("Shots", ss.shots)
-    col2.metric("Shots (T)", ss.shotsTarget)
-    col3.metric("Rebounds", ss.reboundDribbles)
-    col4.metric("Own goals", ss.ownGoals)
+    columns = st.columns(nb_cols)
+    for i, stat in enumerate(CARD_STATS):
+        value = stat_value(stat, statsheet)
+        columns[i % nb_cols].metric(stat.label, format_stat(stat, value))
 
 
 def format_period_filter(v: int):
@@ -112,7 +89,6 @@ def format_period_filter(v: int):
 
 
 def filter_periods(match: LeagueMatch):
-    match_copy = copy.deepcopy(match)
     period_select = st.selectbox(
         "Select periods",
         list(range(len(match.periods) + 1)),
@@ -120,15 +96,31 @@ def filter_periods(match: LeagueMatch):
     )
 
     if period_select == 0:
-        return match_copy
+        return MatchPeriodView(match)
+    return MatchPeriodView(match, period_select - 1)
+
+
+def display_ratio(values: tuple) -> str:
+    if sum(values) == 0:
+        return "-"
+    ratio_1 = values[0] / sum(values)
+    return f"{100 * ratio_1:.1f}% - {100 * (1 - ratio_1):.1f}%"
 
-    match_copy.addBlue = 0
-    match_copy.addRed = 0
-    match_copy.periods = [match.periods[period_select - 1]]
-    if period_select % 2 == 0:
-        match_copy.detail[0].startsRed = not match_copy.detail[0].startsRed
-        match_copy.detail[1].startsRed = not match_copy.detail[1].startsRed
-    return match_copy
+
+def display_periods_comparison(match: LeagueMatch):
+    period_views = get_period_views(match)
+    if len(period_views) < 2:
+        return
+    comparison = {"": ["Score", "Possession", "Action zone"]}
+    for i, period_view in enumerate(period_views):
+        info = get_info_match(period_view)
+        comparison[format_period_filter(i + 1)] = [
+            f"{info.score[0]}-{info.score[1]}",
+            display_ratio(info.possession),
+            display_ratio(info.action_zone),
+        ]
+    st.write("#### Periods")
+    st.table(comparison)
 
 
 def display_stats_general(match: LeagueMatch):
@@ -152,6 +144,34 @@ def display_stats_general(match: LeagueMatch):
     st.text(f"Action zone: {100 * action_1:.1f}% - {100 * action_2:.1f}%")
 
 
+def display_goal_timeline(
+    match: LeagueMatch,
+    players: list[LeaguePlayer],
+    version: tuple[int, int],
+    period_index: Optional[int],
+):
+    timeline = get_goal_timeline_cached(match, players, version)
+    if period_index is not None:
+        timeline = [e for e in timeline if e.period == period_index + 1]
+    if len(timeline) == 0:
+        return
+    st.write("#### Goals")
+    st.table(
+        {
+            "time": [display_gametime(e.time) for e in timeline],
+            "team": [e.team.name for e in timeline],
+            "scorer": [
+                f"{e.scorer} (OG)" if e.own_goal else e.scorer for e in timeline
+            ],
+            "assist": [e.assist or "" for e in timeline],
+            "assist (2)": [e.secondary_assist or "" for e in timeline],
+            "assist (3)": [e.tertiary_assist or "" for e in timeline],
+            "passes": [e.passes for e in timeline],
+            "score": [f"{e.score[0]}-{e.score[1]}" for e in timeline],
+        }
+    )
+
+
 def display_stats_team(statsheet_list: list[PlayerStatSheet], team: LeagueTeam):
     pss_list_1 = [pss for pss in statsheet_list if pss.team == team]
     pss_list_team1 = sum_sheets(pss_list_1)
@@ -164,17 +184,23 @@ def display_stats_team(statsheet_list: list[PlayerStatSheet], team: LeagueTeam):
         display_statsheet(pss_filter[0])
 
 
-def display_stats_teams(match: LeagueMatch, players: list[LeaguePlayer]):
-    detail_1, detail_2 = match.detail[0], match.detail[1]
+def display_stats_teams(match: MatchPeriodView, players: list[LeaguePlayer]):
+    detail_1, detail_2 = match.match.detail[0], match.match.detail[1]
     tab1, tab2 = st.tabs([detail_1.team.name, detail_2.team.name])
 
-    ps_list = get_statsheet_list(players, match)
+    with timed("match_details.resolve") as t:
+        ps_list = get_sheet_store().get(match.match, players)
+        if match.period_index is not None:
+            period_id = match.periods[0].id
+            ps_list = [pss for pss in ps_list if pss.stats.periodId == period_id]
+        t.add_rows(len(ps_list))
 
-    with tab1:
-        display_stats_team(ps_list, detail_1.team)
+    with timed("match_details.render_teams", rows=len(ps_list)):
+        with tab1:
+            display_stats_team(ps_list, detail_1.team)
 
-    with tab2:
-        display_stats_team(ps_list, detail_2.team)
+        with tab2:
+            display_stats_team(ps_list, detail_2.team)
     return None
 
 
@@ -185,19 +211,30 @@ def main():
 
     db: Prisma = st.session_state["db"]
 
-    matches_list = get_matches(db)
-    teams_list = get_teams(db)
-    divisions_list = get_divisions(db)
-    players_list = get_players(db)
+    season = select_season(db)
+    with timed("match_details.load"):
+        teams_list = get_season_teams(get_teams(db), get_season_id(season))
+        divisions_list = get_season_divisions(get_divisions(db), get_season_id(season))
+        players_list = get_players(db)
+        sync_changes(db)
+        snapshot = get_season_snapshot(db, season)
+        version, calendar = snapshot.version, snapshot.calendar
 
     st.write("# Match details")
 
-    match_play: LeagueMatch = select_match(divisions_list, matches_list, teams_list)
+    match_play: LeagueMatch = select_match(divisions_list, calendar, teams_list)
     if match_play is None:
         return
 
     match_periods = filter_periods(match_play)
-    display_stats_general(match_periods)
+    with timed("match_details.render_general"):
+        display_stats_general(match_periods)
+        if match_periods.period_index is None:
+            display_periods_comparison(match_play)
+    with timed("match_details.render_timeline"):
+        display_goal_timeline(
+            match_play, players_list, version, match_periods.period_index
+        )
     display_stats_teams(match_periods, players_list)
 
 
@@ -2,20 +2,48 @@ from typing import Optional
 
 import streamlit as st
 from prisma import Prisma
-from prisma.models import LeagueDivision, LeagueMatch, LeagueTeam
-from prisma.types import (
-    LeagueMatchDetailCreateWithoutRelationsInput,
-    PeriodWhereUniqueInput,
-)
+from prisma.models import LeagueDivision, LeagueMatch, LeaguePlayer, LeagueTeam
+from prisma.types import PeriodWhereUniqueInput
 from st_pages import add_indentation
 
+from utils.admin import get_match_detail_data, get_title
+from utils.audit import (
+    MATCH_ENTITY,
+    ConflictError,
+    claim_matches,
+    get_author,
+    get_detail_snapshot,
+    get_entity_history,
+    match_audit_data,
+    sync_changes,
+)
+from utils.bulk_import import (
+    IMPORT_COLUMNS,
+    MatchImport,
+    parse_import_file,
+    process_import,
+    validate_import,
+)
 from utils.data import (
+    get_current_season_id,
+    get_data_version,
     get_divisions,
     get_matches,
-    get_periods,
+    get_period_links,
+    get_players,
+    get_season_divisions,
+    get_season_teams,
     get_teams,
     init_connection,
+    refresh_matches,
 )
+from utils.league_calendar import LeagueCalendar, get_league_calendar
+from utils.matching import (
+    get_suggested_imports,
+    get_unlinked_periods,
+    suggest_periods,
+)
+from utils.metrics import timed
 from utils.utils import hide_streamlit_elements
 
 hide_streamlit_elements()
@@ -25,14 +53,8 @@ add_indentation()
 def select_match(
     divisions: list[LeagueDivision],
     teams: list[LeagueTeam],
-    matches: list[LeagueMatch],
+    calendar: LeagueCalendar,
 ):
-    matchday_options = {
-        div.id: list(
-            dict.fromkeys([m.matchday for m in matches if m.leagueDivisionId == div.id])
-        )
-        for div in divisions
-    }
     col1, col2, col3 = st.columns([3, 2, 9])
     with col1:
         div_name_select = st.selectbox(
@@ -58,15 +80,12 @@ def select_match(
             team_options,
         )
 
-    matchdays_options_div = matchday_options[div_select.id]
+    matchdays_options_div = calendar.matchdays(div_select.id)
     matchday_select = st.select_slider("Matchday", options=matchdays_options_div)
+    match_ids = calendar.matches_on(div_select.id, matchday_select)
 
     match_list_filter: list[LeagueMatch] = []
-    for m in matches:
-        if m.matchday != matchday_select:
-            continue
-        if m.LeagueDivision.name != div_name_select:
-            continue
+    for m in calendar.get_matches(match_ids):
         if team_select is None or any([md.team.name == team_select for md in m.detail]):
             match_list_filter.append(m)
 
@@ -104,71 +123,62 @@ def select_update_teams(teams: list[LeagueTeam], match: LeagueMatch):
                 "Team 2",
                 [None] + [t for t in team_choices if t != team1_select],
             )
-    team_list_1 = [t for t in teams if t.name == team1_select]
-    if len(team_list_1) == 0:
-        team1 = None
-    else:
-        team1 = team_list_1[0]
-    team_list_2 = [t for t in teams if t.name == team2_select]
-    if len(team_list_2) == 0:
-        team2 = None
-    else:
-        team2 = team_list_2[0]
-    return team1, team2
-
-
-def get_title(match: LeagueMatch, teams: tuple[Optional[LeagueTeam]]):
-    md: str = match.matchday
-    game_nb = match.gameNumber
-    t1 = teams[0].name if teams[0] is not None else "nan"
-    t2 = teams[1].name if teams[1] is not None else "nan"
-    if md.isdigit():
-        title = f"MD {md} - {t1} vs {t2}"
-    else:
-        if game_nb > 1:
-            title = f"{md} {game_nb} - {t1} vs {t2}"
-        else:
-            title = f"{md} - {t1} vs {t2}"
-    return title
+    # Team names are only unique in their division
+    division_teams = {
+        t.name: t for t in teams if t.division.id == match.leagueDivisionId
+    }
+    return division_teams.get(team1_select), division_teams.get(team2_select)
+
+
+def get_seen_versions(key: str, matches: list[LeagueMatch]) -> dict[int, int]:
+    # Kept from the first render, the reruns refresh the cached matches and
+    # claiming with their versions would never detect a concurrent edit
+    seen = st.session_state.setdefault("seen_versions", {}).setdefault(key, {})
+    for m in matches:
+        seen.setdefault(m.id, m.version)
+    return {m.id: seen[m.id] for m in matches}
+
+
+def forget_seen_versions(key: str):
+    st.session_state.get("seen_versions", {}).pop(key, None)
+
+
+def get_edit_version(match: LeagueMatch) -> int:
+    return get_seen_versions(f"edit-{match.id}", [match])[match.id]
+
+
+def forget_edit_version(match: LeagueMatch):
+    forget_seen_versions(f"edit-{match.id}")
 
 
 def process_update_teams(
-    db: Prisma, teams: tuple[Optional[LeagueTeam]], match: LeagueMatch
+    db: Prisma, teams: tuple[Optional[LeagueTeam]], match: LeagueMatch, version: int
 ):
-    db.leaguematchdetail.delete_many(where={"leagueMatchId": match.id})
-
-    data_list: list[LeagueMatchDetailCreateWithoutRelationsInput] = []
-    if teams[0] is not None:
-        data_point_1: LeagueMatchDetailCreateWithoutRelationsInput = {
-            "leagueMatchId": match.id,
-            "leagueTeamId": teams[0].id,
-            "startsRed": True,
-            "home": True,
-        }
-        data_list.append(data_point_1)
-    if teams[1] is not None:
-        data_point_2: LeagueMatchDetailCreateWithoutRelationsInput = {
-            "leagueMatchId": match.id,
-            "leagueTeamId": teams[1].id,
-            "startsRed": False,
-            "home": False,
-        }
-        data_list.append(data_point_2)
-
-    db.leaguematchdetail.create_many(data=data_list)
-
+    data_list = get_match_detail_data(match.id, teams)
     match_title = get_title(match, teams)
-    db.leaguematch.update(
-        where={
-            "id": match.id,
-        },
-        data={
-            "title": match_title,
-        },
-    )
 
-    get_matches.clear()
-    return get_matches(db)
+    with claim_matches(db, {match.id: version}), db.batch_() as batcher:
+        batcher.leaguematchdetail.delete_many(where={"leagueMatchId": match.id})
+        batcher.leaguematchdetail.create_many(data=data_list)
+        batcher.leaguematch.update(
+            where={
+                "id": match.id,
+            },
+            data={
+                "title": match_title,
+            },
+        )
+        batcher.auditlog.create(
+            data=match_audit_data(
+                get_author(),
+                "update_teams",
+                match,
+                title=match_title,
+                detail=get_detail_snapshot(data_list),
+            )
+        )
+
+    return refresh_matches(db, [match.id])
 
 
 def get_idx_starting_red_team(match: LeagueMatch):
@@ -211,6 +221,31 @@ def get_periods_id_match(match: LeagueMatch):
     return str(match.periods[0].id), str(match.periods[1].id), str(match.periods[2].id)
 
 
+def validate_periods_id(db: Prisma, match: LeagueMatch, periods_id: list[str]):
+    can_submit = True
+    periods_int: dict[int, int] = {}
+    for i, period_id in enumerate(periods_id):
+        if period_id == "":
+            continue
+        if not period_id.strip().isdigit():
+            can_submit = False
+            st.error(f"Period {i + 1} id invalid!")
+            continue
+        periods_int[i] = int(period_id)
+
+    period_links = get_period_links(db, list(periods_int.values()))
+    for i, period_id in periods_int.items():
+        if period_id not in period_links:
+            can_submit = False
+            st.error(f"Period {i + 1} id invalid!")
+        elif period_links[period_id] not in (None, match.id):
+            st.warning(
+                f"Period {i + 1} is already linked to match {period_links[period_id]}"
+                + ", submitting will move it to this match"
+            )
+    return can_submit
+
+
 def process_edit(
     db: Prisma,
     match: LeagueMatch,
@@ -222,28 +257,8 @@ def process_edit(
     period2_id: str,
     period3_id: str,
     replay_url: str,
+    version: int,
 ):
-
-    db.leaguematchdetail.update(
-        where={
-            "leagueMatchId_leagueTeamId": {
-                "leagueMatchId": match.id,
-                "leagueTeamId": match.detail[0].leagueTeamId,
-            }
-        },
-        data={"startsRed": first_team_starts},
-    )
-
-    db.leaguematchdetail.update(
-        where={
-            "leagueMatchId_leagueTeamId": {
-                "leagueMatchId": match.id,
-                "leagueTeamId": match.detail[1].leagueTeamId,
-            }
-        },
-        data={"startsRed": not first_team_starts},
-    )
-
     periods: list[PeriodWhereUniqueInput] = []
     if period1_id != "":
         periods.append({"id": int(period1_id)})
@@ -252,25 +267,197 @@ def process_edit(
     if period3_id != "":
         periods.append({"id": int(period3_id)})
 
-    db.leaguematch.update(
-        where={
-            "id": match.id,
-        },
-        data={
-            "defwin": defwin,
-            "addRed": red_score_adjustment,
-            "addBlue": blue_score_adjustment,
-            "periods": {
-                "set": periods,
+    # Periods moved from other matches change those matches as well
+    period_ids = [p["id"] for p in periods]
+    previous_ids = {
+        match_id
+        for match_id in get_period_links(db, period_ids).values()
+        if match_id not in (None, match.id)
+    }
+    previous_matches = db.leaguematch.find_many(
+        where={"id": {"in": list(previous_ids)}},
+        include={"detail": True, "periods": True},
+    )
+    versions = {match.id: version, **{m.id: m.version for m in previous_matches}}
+
+    with claim_matches(db, versions), db.batch_() as batcher:
+        batcher.leaguematchdetail.update(
+            where={
+                "leagueMatchId_leagueTeamId": {
+                    "leagueMatchId": match.id,
+                    "leagueTeamId": match.detail[0].leagueTeamId,
+                }
+            },
+            data={"startsRed": first_team_starts},
+        )
+        batcher.leaguematchdetail.update(
+            where={
+                "leagueMatchId_leagueTeamId": {
+                    "leagueMatchId": match.id,
+                    "leagueTeamId": match.detail[1].leagueTeamId,
+                }
+            },
+            data={"startsRed": not first_team_starts},
+        )
+        batcher.leaguematch.update(
+            where={
+                "id": match.id,
+            },
+            data={
+                "defwin": defwin,
+                "addRed": red_score_adjustment,
+                "addBlue": blue_score_adjustment,
+                "periods": {
+                    "set": periods,
+                },
+                "replayURL": replay_url,
             },
-            "replayURL": replay_url,
-        },
+        )
+        batcher.auditlog.create(
+            data=match_audit_data(
+                get_author(),
+                "edit",
+                match,
+                defwin=defwin,
+                addRed=red_score_adjustment,
+                addBlue=blue_score_adjustment,
+                periods=[p["id"] for p in periods],
+                replayURL=replay_url,
+                detail=[
+                    {
+                        "leagueTeamId": md.leagueTeamId,
+                        "home": md.home,
+                        "startsRed": first_team_starts == (i == 0),
+                    }
+                    for i, md in enumerate(match.detail)
+                ],
+            )
+        )
+        for previous in previous_matches:
+            batcher.auditlog.create(
+                data=match_audit_data(
+                    get_author(),
+                    "move_periods",
+                    previous,
+                    periods=[p.id for p in previous.periods if p.id not in period_ids],
+                )
+            )
+
+    return refresh_matches(db, list(versions))
+
+
+def process_bulk_import(db: Prisma, imports: list[MatchImport], versions_key: str):
+    versions = get_seen_versions(versions_key, [mi.match for mi in imports])
+    try:
+        with timed("edit_match.import", rows=len(imports)):
+            process_import(db, imports, versions, get_author())
+    finally:
+        forget_seen_versions(versions_key)
+    return refresh_matches(db, [mi.match.id for mi in imports])
+
+
+def display_conflict(error: ConflictError):
+    st.error(
+        f"{error}, nothing was saved. "
+        + "The matches were reloaded, check their current values and submit again."
     )
 
-    get_matches.clear()
-    get_periods.clear()
 
-    return get_matches(db), get_periods(db)
+def display_history(db: Prisma, match: LeagueMatch):
+    with st.expander("History"):
+        history = get_entity_history(db, MATCH_ENTITY, match.id)
+        if len(history) == 0:
+            st.info("No change recorded for this match")
+            return
+        st.table(
+            {
+                "date": [h.createdAt.strftime("%Y-%m-%d %H:%M") for h in history],
+                "author": [h.author for h in history],
+                "action": [h.action for h in history],
+                "before": [str(h.before) for h in history],
+                "after": [str(h.after) for h in history],
+            }
+        )
+
+
+def display_bulk_import(db: Prisma, calendar: LeagueCalendar, teams: list[LeagueTeam]):
+    with st.expander("Bulk import"):
+        st.caption(f"CSV or JSON file with fields: {', '.join(IMPORT_COLUMNS)}")
+        import_file = st.file_uploader("Results file", type=["csv", "json"])
+        if import_file is None:
+            return
+
+        rows, errors = parse_import_file(import_file.getvalue(), import_file.name)
+        if len(errors) == 0:
+            imports, errors = validate_import(db, rows, calendar.matches_by_id, teams)
+        for error in errors:
+            st.error(error)
+        if len(errors) > 0:
+            return
+
+        st.table(
+            {
+                "match": [mi.match.title for mi in imports],
+                "teams": [
+                    f"{mi.teams[0].name} vs {mi.teams[1].name}" for mi in imports
+                ],
+                "periods": [
+                    ", ".join(str(p) for p in mi.row.periods) for mi in imports
+                ],
+                "defwin": [mi.row.defwin for mi in imports],
+            }
+        )
+        # The versions the admin saw when the file was uploaded
+        versions_key = f"import-{import_file.id}"
+        get_seen_versions(versions_key, [mi.match for mi in imports])
+        if st.button(f"Import {len(imports)} matches"):
+            try:
+                process_bulk_import(db, imports, versions_key)
+                st.success(f"{len(imports)} games processed")
+            except ConflictError as e:
+                display_conflict(e)
+
+
+def display_period_suggestions(
+    db: Prisma,
+    calendar: LeagueCalendar,
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+):
+    with st.expander("Unlinked periods"):
+        if not st.checkbox("Search matches for unlinked periods", False):
+            return
+        with timed("edit_match.suggest") as t:
+            periods = get_unlinked_periods(db)
+            suggestions = suggest_periods(periods, players, calendar)
+            t.add_rows(len(periods))
+        if len(suggestions) == 0:
+            st.info("No unlinked period could be matched")
+            return
+
+        teams_by_id = {t.id: t.name for t in teams}
+        st.table(
+            {
+                "period": [str(s.period.id) for s in suggestions],
+                "match": [s.match.title for s in suggestions],
+                "red team": [teams_by_id.get(s.red_team_id) for s in suggestions],
+                "confidence": [f"{100 * s.score:.0f}%" for s in suggestions],
+                "unknown players": [s.unknown_players for s in suggestions],
+            }
+        )
+
+        min_score = st.slider("Minimum confidence", 0.0, 1.0, 0.6, 0.05)
+        rows = get_suggested_imports(suggestions, min_score)
+        imports, errors = validate_import(db, rows, calendar.matches_by_id, teams)
+        for error in errors:
+            st.warning(f"{error}, the row is skipped")
+        get_seen_versions("suggestions", [mi.match for mi in imports])
+        if st.button(f"Link periods to {len(imports)} matches", disabled=not imports):
+            try:
+                process_bulk_import(db, imports, "suggestions")
+                st.success(f"{len(imports)} games processed")
+            except ConflictError as e:
+                display_conflict(e)
 
 
 def main():
@@ -287,16 +474,24 @@ def main():
         st.error("You are not allowed to see this page")
         return
 
-    matches_list = get_matches(db)
-    teams_list = get_teams(db)
-    divisions_list = get_divisions(db)
-    periods_list = get_periods(db)
+    with timed("edit_match.load"):
+        # Only matches of the current season can be edited
+        season_id = get_current_season_id(db)
+        teams_list = get_season_teams(get_teams(db), season_id)
+        divisions_list = get_season_divisions(get_divisions(db), season_id)
+        sync_changes(db)
+        data_version = get_data_version(db)
+        calendar = get_league_calendar(lambda: get_matches(db), data_version)
 
     st.write("# Add results")
 
-    match_to_edit = select_match(divisions_list, teams_list, matches_list)
+    display_bulk_import(db, calendar, teams_list)
+    display_period_suggestions(db, calendar, teams_list, get_players(db))
+
+    match_to_edit = select_match(divisions_list, teams_list, calendar)
     if match_to_edit is None:
         return
+    version = get_edit_version(match_to_edit)
 
     with st.container():
         st.write("### Teams")
@@ -304,8 +499,12 @@ def main():
         teams_update = select_update_teams(teams_list, match_to_edit)
         btn_teams = st.button("Update teams")
         if btn_teams:
-            process_update_teams(db, teams_update, match_to_edit)
-            st.success("Teams updated")
+            try:
+                process_update_teams(db, teams_update, match_to_edit, version)
+                st.success("Teams updated")
+            except ConflictError as e:
+                display_conflict(e)
+            forget_edit_version(match_to_edit)
 
         st.write("### General")
 
@@ -335,24 +534,14 @@ def main():
             )
 
         st.write("### Periods")
-        all_periods_id = [p.id for p in periods_list]
         game_periods_id = get_periods_id_match(match_to_edit)
-        can_submit = True
 
         period1_id = st.text_input("Period 1 id", game_periods_id[0])
-        if period1_id != "" and int(period1_id) not in all_periods_id:
-            can_submit = False
-            st.error("Period 1 id invalid!")
-
         period2_id = st.text_input("Period 2 id", game_periods_id[1])
-        if period2_id != "" and int(period2_id) not in all_periods_id:
-            can_submit = False
-            st.error("Period 2 id invalid!")
-
         period3_id = st.text_input("Period 3 id", game_periods_id[2])
-        if period3_id != "" and int(period3_id) not in all_periods_id:
-            can_submit = False
-            st.error("Period 3 id invalid!")
+        can_submit = validate_periods_id(
+            db, match_to_edit, [period1_id, period2_id, period3_id]
+        )
 
         st.write("### Replay link")
 
@@ -363,19 +552,26 @@ def main():
             if not can_submit:
                 st.error("Error: Fix the periods id")
             else:
-                process_edit(
-                    db,
-                    match_to_edit,
-                    first_team_starts,
-                    defwin,
-                    red_score_adjustment,
-                    blue_score_adjustment,
-                    period1_id,
-                    period2_id,
-                    period3_id,
-                    replay_url,
-                )
-                st.success("Game processed")
+                try:
+                    process_edit(
+                        db,
+                        match_to_edit,
+                        first_team_starts,
+                        defwin,
+                        red_score_adjustment,
+                        blue_score_adjustment,
+                        period1_id,
+                        period2_id,
+                        period3_id,
+                        replay_url,
+                        version,
+                    )
+                    st.success("Game processed")
+                except ConflictError as e:
+                    display_conflict(e)
+                forget_edit_version(match_to_edit)
+
+    display_history(db, match_to_edit)
 
 
 if __name__ == "__main__":
@@ -5,7 +5,26 @@ from prisma import Prisma
 from prisma.models import LeagueDivision, LeaguePlayer, LeagueTeam
 from st_pages import add_indentation
 
-from utils.data import get_divisions, get_players, get_teams, init_connection
+from utils.audit import (
+    PLAYER_ENTITY,
+    TEAM_ENTITY,
+    audit_data,
+    get_author,
+    sync_changes,
+)
+from utils.data import (
+    get_current_season_id,
+    get_divisions,
+    get_players,
+    get_season_divisions,
+    get_season_teams,
+    get_teams,
+    init_connection,
+    refresh_players,
+    refresh_teams,
+)
+from utils.metrics import timed
+from utils.sheets import get_sheet_store
 from utils.utils import hide_streamlit_elements
 
 hide_streamlit_elements()
@@ -37,7 +56,9 @@ def select_team(teams: list[LeagueTeam], divisions: list[LeagueDivision]):
             "Team",
             team_options,
         )
-    team_list = [t for t in teams if t.name == team_name_select]
+    team_list = [
+        t for t in teams if t.name == team_name_select and t.division.name == div_select
+    ]
     if len(team_list) == 0:
         return None
     return team_list[0]
@@ -85,6 +106,21 @@ def select_new_team(
     return new_team
 
 
+def player_audit_data(action: str, player: LeaguePlayer, before: dict, after: dict):
+    return audit_data(get_author(), action, PLAYER_ENTITY, player.id, before, after)
+
+
+def team_audit_data(action: str, team_id: int, player: LeaguePlayer, active: bool):
+    return audit_data(
+        get_author(),
+        action,
+        TEAM_ENTITY,
+        team_id,
+        {},
+        {"leaguePlayerId": player.id, "active": active},
+    )
+
+
 def process_new_player(db: Prisma, player_name: str, team: LeagueTeam):
     player = db.leagueplayer.create(
         data={
@@ -92,47 +128,199 @@ def process_new_player(db: Prisma, player_name: str, team: LeagueTeam):
             "nicks": [player_name],
         }
     )
-    db.leagueplayerteams.create(
-        data={
-            "active": True,
-            "leaguePlayerId": player.id,
-            "leagueTeamId": team.id,
-        }
-    )
+    with db.batch_() as batcher:
+        batcher.leagueplayerteams.create(
+            data={
+                "active": True,
+                "leaguePlayerId": player.id,
+                "leagueTeamId": team.id,
+            }
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "create", player, {}, {"name": player_name, "nicks": player.nicks}
+            )
+        )
+        batcher.auditlog.create(
+            data=team_audit_data("add_player", team.id, player, True)
+        )
 
-    get_players.clear()
-    get_teams.clear()
-    return get_players(db), get_teams(db)
+    players = refresh_players(db, [player.id])
+    get_sheet_store().reresolve([player_name], players)
+    return players, refresh_teams(db, [team.id])
 
 
 def process_new_nick(db: Prisma, player: LeaguePlayer, nick: str):
     nicks_player = [n for n in player.nicks]
     nicks_player.append(nick.strip())
 
-    db.leagueplayer.update(
-        where={"id": player.id},
-        data={
-            "nicks": {"set": nicks_player},
-        },
-    )
+    with db.batch_() as batcher:
+        batcher.leagueplayer.update(
+            where={"id": player.id},
+            data={
+                "nicks": {"set": nicks_player},
+            },
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "add_nick", player, {"nicks": player.nicks}, {"nicks": nicks_player}
+            )
+        )
 
-    get_players.clear()
-    return get_players(db)
+    players = refresh_players(db, [player.id])
+    get_sheet_store().reresolve([nick], players)
+    return players
 
 
 def process_delete_nick(db: Prisma, player: LeaguePlayer, nick: str):
     nicks_player = [n for n in player.nicks]
     nicks_player.remove(nick)
 
-    db.leagueplayer.update(
-        where={"id": player.id},
-        data={
-            "nicks": {"set": nicks_player},
-        },
-    )
+    with db.batch_() as batcher:
+        batcher.leagueplayer.update(
+            where={"id": player.id},
+            data={
+                "nicks": {"set": nicks_player},
+            },
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "delete_nick", player, {"nicks": player.nicks}, {"nicks": nicks_player}
+            )
+        )
+
+    players = refresh_players(db, [player.id])
+    get_sheet_store().reresolve([nick], players)
+    return players
+
 
-    get_players.clear()
-    return get_players(db)
+def merge_nicks(nicks: list[str], new_nicks: list[str]):
+    merged = [n for n in nicks]
+    lower_nicks = {n.strip().lower() for n in nicks}
+    for nick in new_nicks:
+        nick = nick.strip()
+        if nick == "" or nick.lower() in lower_nicks:
+            continue
+        lower_nicks.add(nick.lower())
+        merged.append(nick)
+    return merged
+
+
+def process_bulk_nicks(db: Prisma, player: LeaguePlayer, nicks_text: str):
+    nicks_player = merge_nicks(player.nicks, nicks_text.splitlines())
+    new_nicks = nicks_player[len(player.nicks) :]
+    if len(new_nicks) == 0:
+        return get_players(db), 0
+
+    with db.batch_() as batcher:
+        batcher.leagueplayer.update(
+            where={"id": player.id},
+            data={
+                "nicks": {"set": nicks_player},
+            },
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "add_nicks", player, {"nicks": player.nicks}, {"nicks": nicks_player}
+            )
+        )
+
+    players = refresh_players(db, [player.id])
+    get_sheet_store().reresolve(new_nicks, players)
+    return players, len(new_nicks)
+
+
+def process_move_nicks(
+    db: Prisma,
+    source: LeaguePlayer,
+    target: LeaguePlayer,
+    nicks: list[str],
+):
+    source_nicks = [n for n in source.nicks if n not in nicks]
+    target_nicks = merge_nicks(target.nicks, nicks)
+    with db.batch_() as batcher:
+        batcher.leagueplayer.update(
+            where={"id": source.id},
+            data={
+                "nicks": {"set": source_nicks},
+            },
+        )
+        batcher.leagueplayer.update(
+            where={"id": target.id},
+            data={
+                "nicks": {"set": target_nicks},
+            },
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "move_nicks", source, {"nicks": source.nicks}, {"nicks": source_nicks}
+            )
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "move_nicks", target, {"nicks": target.nicks}, {"nicks": target_nicks}
+            )
+        )
+
+    players = refresh_players(db, [source.id, target.id])
+    get_sheet_store().reresolve(nicks, players)
+    return players
+
+
+def process_merge_players(db: Prisma, source: LeaguePlayer, target: LeaguePlayer):
+    target_teams = {tp.leagueTeamId: tp for tp in target.teams}
+    target_nicks = merge_nicks(target.nicks, source.nicks)
+    with db.batch_() as batcher:
+        # The source team links are deleted with it, the target gets them below
+        batcher.leagueplayer.delete(where={"id": source.id})
+        batcher.leagueplayer.update(
+            where={"id": target.id},
+            data={
+                "nicks": {"set": target_nicks},
+            },
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "merge",
+                source,
+                {"name": source.name, "nicks": source.nicks},
+                {"mergedInto": target.id},
+            )
+        )
+        batcher.auditlog.create(
+            data=player_audit_data(
+                "merge", target, {"nicks": target.nicks}, {"nicks": target_nicks}
+            )
+        )
+        for tp in source.teams:
+            target_tp = target_teams.get(tp.leagueTeamId)
+            active = tp.active or (target_tp is not None and target_tp.active)
+            batcher.leagueplayerteams.upsert(
+                where={
+                    "leaguePlayerId_leagueTeamId": {
+                        "leaguePlayerId": target.id,
+                        "leagueTeamId": tp.leagueTeamId,
+                    },
+                },
+                data={
+                    "create": {
+                        "leaguePlayerId": target.id,
+                        "leagueTeamId": tp.leagueTeamId,
+                        "active": active,
+                    },
+                    "update": {"active": active},
+                },
+            )
+            batcher.auditlog.create(
+                data=team_audit_data("merge", tp.leagueTeamId, target, active)
+            )
+
+    # Only the players version moves, the sheets of both players' nicks are
+    # re-resolved and the views built from the matches are kept
+    team_ids = list({tp.leagueTeamId for tp in source.teams + target.teams})
+    players = refresh_players(db, [source.id, target.id])
+    get_sheet_store().reresolve(source.nicks + target.nicks, players)
+    return refresh_teams(db, team_ids), players
 
 
 def process_new_team(
@@ -144,38 +332,44 @@ def process_new_team(
     if current_team is None:
         current_team = get_current_team(player)
 
-    if current_team is not None:
-        db.leagueplayerteams.update(
-            where={
-                "leaguePlayerId_leagueTeamId": {
-                    "leaguePlayerId": player.id,
-                    "leagueTeamId": current_team.id,
+    with db.batch_() as batcher:
+        if current_team is not None:
+            batcher.leagueplayerteams.update(
+                where={
+                    "leaguePlayerId_leagueTeamId": {
+                        "leaguePlayerId": player.id,
+                        "leagueTeamId": current_team.id,
+                    },
                 },
-            },
-            data={"active": False},
-        )
-
-    if new_team is not None:
-        db.leagueplayerteams.upsert(
-            where={
-                "leaguePlayerId_leagueTeamId": {
-                    "leaguePlayerId": player.id,
-                    "leagueTeamId": new_team.id,
+                data={"active": False},
+            )
+            batcher.auditlog.create(
+                data=team_audit_data("remove_player", current_team.id, player, False)
+            )
+
+        if new_team is not None:
+            batcher.leagueplayerteams.upsert(
+                where={
+                    "leaguePlayerId_leagueTeamId": {
+                        "leaguePlayerId": player.id,
+                        "leagueTeamId": new_team.id,
+                    },
                 },
-            },
-            data={
-                "create": {
-                    "leaguePlayerId": player.id,
-                    "leagueTeamId": new_team.id,
-                    "active": True,
+                data={
+                    "create": {
+                        "leaguePlayerId": player.id,
+                        "leagueTeamId": new_team.id,
+                        "active": True,
+                    },
+                    "update": {"active": True},
                 },
-                "update": {"active": True},
-            },
-        )
+            )
+            batcher.auditlog.create(
+                data=team_audit_data("add_player", new_team.id, player, True)
+            )
 
-    get_teams.clear()
-    get_players.clear()
-    return get_teams(db), get_players(db)
+    team_ids = [t.id for t in [current_team, new_team] if t is not None]
+    return refresh_teams(db, team_ids), refresh_players(db, [player.id])
 
 
 def main():
@@ -192,13 +386,19 @@ def main():
         st.error("You are not allowed to see this page")
         return
 
-    teams_list = get_teams(db)
-    divisions_list = get_divisions(db)
-    players_list = get_players(db)
+    with timed("edit_player.load"):
+        sync_changes(db)
+        teams_list = get_teams(db)
+        divisions_list = get_divisions(db)
+        players_list = get_players(db)
 
     st.write("# Edit player details")
 
-    team = select_team(teams_list, divisions_list)
+    season_id = get_current_season_id(db)
+    team = select_team(
+        get_season_teams(teams_list, season_id),
+        get_season_divisions(divisions_list, season_id),
+    )
 
     st.write("## Add new player")
     player_name = st.text_input("Player name", "")
@@ -233,8 +433,46 @@ def main():
         players_list = process_new_nick(db, player, new_nick)
         st.success("Nick added")
 
+    st.write("#### Bulk nicks")
+    bulk_nicks = st.text_area("Nicks, one per line", "")
+    bulk_submitted = st.button("Add nicks")
+    if bulk_submitted:
+        players_list, nb_nicks = process_bulk_nicks(db, player, bulk_nicks)
+        st.success(f"{nb_nicks} nicks added")
+
+    other_players = [p for p in players_list if p.id != player.id]
+
+    st.write("#### Move nicks")
+    moved_nicks = st.multiselect("Nicks to move", player.nicks)
+    move_target = st.selectbox(
+        "Move to",
+        other_players,
+        format_func=lambda p: p.name,
+        key="move_target",
+    )
+    move_submitted = st.button(
+        "Move nicks", disabled=(len(moved_nicks) == 0 or move_target is None)
+    )
+    if move_submitted:
+        players_list = process_move_nicks(db, player, move_target, moved_nicks)
+        st.success(f"{len(moved_nicks)} nicks moved to {move_target.name}")
+
+    st.write("#### Merge player")
+    merge_target = st.selectbox(
+        "Merge into",
+        other_players,
+        format_func=lambda p: p.name,
+        key="merge_target",
+    )
+    st.warning(f"{player.name} will be deleted, its nicks and teams are kept")
+    merge_submitted = st.button("Merge player", disabled=(merge_target is None))
+    if merge_submitted:
+        teams_list, players_list = process_merge_players(db, player, merge_target)
+        st.success(f"{player.name} merged into {merge_target.name}")
+        return
+
     st.write("#### Team")
-    new_team = select_new_team(player, team, teams_list)
+    new_team = select_new_team(player, team, get_season_teams(teams_list, season_id))
     team_submitted = st.button("Change team")
     if team_submitted:
         teams_list, players_list = process_new_team(db, player, team, new_team)
@@ -0,0 +1,101 @@
+import time
+
+import streamlit as st
+from prisma import Prisma
+from st_pages import add_indentation
+
+from utils.cache import get_stats_cache
+from utils.data import init_connection
+from utils.league_calendar import get_calendar_cache
+from utils.metrics import METRICS_ENABLED, get_metrics_store
+from utils.shared_cache import get_shared_cache
+from utils.snapshots import get_snapshot_publisher
+from utils.timeline import get_timeline_cache
+from utils.utils import hide_streamlit_elements
+
+hide_streamlit_elements()
+add_indentation()
+
+
+def display_snapshot(db: Prisma):
+    st.write("## Snapshot")
+    snapshot = get_snapshot_publisher(db).latest()
+    if snapshot is None:
+        st.warning("The prewarm has not published a snapshot yet")
+        return
+    st.write(
+        f"Data version {snapshot.data_version}, built in "
+        + f"{snapshot.build_time:.2f} s, {time.time() - snapshot.created_at:.0f} s ago"
+    )
+
+
+def display_steps():
+    st.write("## Steps")
+    if not METRICS_ENABLED:
+        st.info("Metrics are disabled, set DASHBOARD_METRICS=1 to collect them")
+    steps = get_metrics_store().summary()
+    if len(steps) == 0:
+        st.write("No step recorded yet")
+        return
+    st.dataframe(
+        {k: [s[k] for s in steps] for k in steps[0]},
+        use_container_width=True,
+    )
+
+
+def display_caches():
+    st.write("## Caches")
+    caches = {
+        "Statistics": get_stats_cache(),
+        "Goal timelines": get_timeline_cache(),
+        "Calendar": get_calendar_cache(),
+    }
+    infos = {name: cache.info() for name, cache in caches.items()}
+    st.table(
+        {
+            "cache": list(infos.keys()),
+            "hits": [i.hits for i in infos.values()],
+            "misses": [i.misses for i in infos.values()],
+            "hit rate": [f"{100 * i.hit_rate:.1f}%" for i in infos.values()],
+            "size": [f"{i.size}/{i.maxsize}" for i in infos.values()],
+        }
+    )
+
+    shared = get_shared_cache()
+    if shared is None:
+        st.write(
+            "No shared cache, set SHARED_CACHE_URL to share loads between replicas"
+        )
+    else:
+        st.write(
+            f"Shared cache: {shared.hits} hits, {shared.misses} misses, "
+            + f"generation {shared.generation()}"
+        )
+
+
+def main():
+    if (
+        "authentication_status" not in st.session_state
+        or not st.session_state["authentication_status"]
+    ):
+        st.error("You are not allowed to see this page")
+        return
+
+    if "db" not in st.session_state:
+        db = init_connection()
+        st.session_state["db"] = db
+
+    db: Prisma = st.session_state["db"]
+
+    st.write("# Performance")
+
+    if st.button("Reset metrics"):
+        get_metrics_store().clear()
+
+    display_snapshot(db)
+    display_steps()
+    display_caches()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from typing import Optional
+
+from prisma.models import LeagueMatch, LeagueTeam
+from prisma.types import LeagueMatchDetailCreateWithoutRelationsInput
+
+
+def get_title(match: LeagueMatch, teams: tuple[Optional[LeagueTeam]]):
+    md: str = match.matchday
+    game_nb = match.gameNumber
+    t1 = teams[0].name if teams[0] is not None else "nan"
+    t2 = teams[1].name if teams[1] is not None else "nan"
+    if md.isdigit():
+        title = f"MD {md} - {t1} vs {t2}"
+    else:
+        if game_nb > 1:
+            title = f"{md} {game_nb} - {t1} vs {t2}"
+        else:
+            title = f"{md} - {t1} vs {t2}"
+    return title
+
+
+def get_match_detail_data(
+    match_id: int,
+    teams: tuple[Optional[LeagueTeam]],
+    first_team_starts: bool = True,
+):
+    data_list: list[LeagueMatchDetailCreateWithoutRelationsInput] = []
+    if teams[0] is not None:
+        data_point_1: LeagueMatchDetailCreateWithoutRelationsInput = {
+            "leagueMatchId": match_id,
+            "leagueTeamId": teams[0].id,
+            "startsRed": first_team_starts,
+            "home": True,
+        }
+        data_list.append(data_point_1)
+    if teams[1] is not None:
+        data_point_2: LeagueMatchDetailCreateWithoutRelationsInput = {
+            "leagueMatchId": match_id,
+            "leagueTeamId": teams[1].id,
+            "startsRed": not first_team_starts,
+            "home": False,
+        }
+        data_list.append(data_point_2)
+    return data_list
@@ -0,0 +1,319 @@
+import argparse
+import gzip
+import hashlib
+import json
+import math
+import os
+import threading
+import time
+from dataclasses import dataclass
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Callable, Optional
+from urllib.parse import parse_qs, urlsplit
+
+from prisma import Prisma
+from prisma.models import LeagueDivision
+
+from utils.audit import sync_changes
+from utils.cache import LRUCache
+from utils.data import (
+    get_current_season_id,
+    get_divisions,
+    get_players,
+    get_season_divisions,
+    get_teams,
+)
+from utils.sheets import get_sheet_store
+from utils.snapshots import (
+    Snapshot,
+    get_default_standings_key,
+    get_default_stats_key,
+    get_snapshot,
+    get_snapshot_publisher,
+    start_prewarm,
+)
+from utils.standings import build_match_db
+from utils.stats import build_stats_table, compute_stats
+from utils.summary import SUMMARY_COLUMNS
+from utils.utils import get_info_match
+
+API_PORT = int(os.environ.get("API_PORT", "0"))
+MIN_GZIP_SIZE = 512
+READY_PATH = "/api/ready"
+
+
+class ApiError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+@dataclass(frozen=True)
+class ApiResponse:
+    status: int
+    body: bytes
+    gzipped: bytes
+
+
+def clean_rows(rows: list[dict]) -> list[dict]:
+    return [
+        {
+            k: None if isinstance(v, float) and math.isnan(v) else v
+            for k, v in row.items()
+        }
+        for row in rows
+    ]
+
+
+def get_param(query: dict[str, list[str]], name: str) -> Optional[str]:
+    values = query.get(name)
+    return values[0] if values else None
+
+
+def get_division(db: Prisma, query: dict[str, list[str]]) -> LeagueDivision:
+    name = get_param(query, "division")
+    divisions = get_season_divisions(get_divisions(db), get_current_season_id(db))
+    if len(divisions) == 0:
+        raise ApiError(404, "No division in the current season")
+    if name is None:
+        return divisions[0]
+    for division in divisions:
+        if division.name == name or str(division.id) == name:
+            return division
+    raise ApiError(404, f"Unknown division {name}")
+
+
+def get_standings(db: Prisma, snapshot: Snapshot, path_id, query):
+    division = get_division(db, query)
+    key = get_default_standings_key(snapshot.calendar, division.id)
+    standings = snapshot.standings.get(key)
+    if standings is None:
+        standings = build_match_db(snapshot.calendar, division, key[1])
+    return {
+        "division": division.name,
+        "standings": standings.to_dict(orient="records"),
+    }
+
+
+def get_matches(db: Prisma, snapshot: Snapshot, path_id, query):
+    division = get_division(db, query)
+    table = snapshot.summary.lookup(
+        division.id, get_param(query, "team"), get_param(query, "matchday")
+    ).select(SUMMARY_COLUMNS)
+    return {"division": division.name, "matches": clean_rows(table.to_dicts())}
+
+
+def get_match(db: Prisma, snapshot: Snapshot, path_id, query):
+    match = snapshot.calendar.matches_by_id.get(path_id)
+    if match is None:
+        raise ApiError(404, f"Unknown match {path_id}")
+    info = get_info_match(match)
+    sheets = get_sheet_store().get(match, get_players(db))
+    teams = []
+    for md in match.detail:
+        team_sheets = [s for s in sheets if s.team == md.team]
+        teams.append(
+            {
+                "name": md.team.name,
+                "home": md.home,
+                "players": clean_rows(build_stats_table(team_sheets, False).to_dicts()),
+            }
+        )
+    return {
+        "id": match.id,
+        "title": match.title,
+        "date": match.date,
+        "matchday": match.matchday,
+        "score": info.score,
+        "possession": info.possession,
+        "actionZone": info.action_zone,
+        "defwin": match.defwin,
+        "replayURL": match.replayURL,
+        "teams": teams,
+    }
+
+
+def get_player_stats(db: Prisma, snapshot: Snapshot, path_id, query):
+    division = get_division(db, query)
+    team_name = get_param(query, "team")
+    normalized = get_param(query, "normalized") == "1"
+    key = get_default_stats_key(snapshot.calendar, division.id)
+    key = (division.id, team_name, key[2], normalized, False, None)
+    stats = snapshot.stats.get(key)
+    if stats is None:
+        stats = compute_stats(
+            snapshot.calendar,
+            get_teams(db),
+            get_players(db),
+            division,
+            team_name,
+            key[2],
+            normalized,
+            False,
+            None,
+        )
+    return {"division": division.name, "stats": clean_rows(stats.table.to_dicts())}
+
+
+ROUTES: dict[tuple[str, bool], Callable] = {
+    ("standings", False): get_standings,
+    ("matches", False): get_matches,
+    ("matches", True): get_match,
+    ("stats", False): get_player_stats,
+}
+
+
+def get_etag(snapshot: Snapshot, path: str) -> str:
+    # Built from the content, replicas and restarts give the same ETag
+    digest = hashlib.sha1(f"{snapshot.digest}:{path}".encode()).hexdigest()
+    return f'"{digest[:20]}"'
+
+
+class DashboardApi:
+    def __init__(self, db: Prisma):
+        self.db = db
+        self.responses = LRUCache(maxsize=256)
+
+    def render(self, snapshot: Snapshot, path: str) -> ApiResponse:
+        url = urlsplit(path)
+        parts = [p for p in url.path.split("/") if p != ""]
+        try:
+            if len(parts) not in (2, 3) or parts[0] != "api":
+                raise ApiError(404, "Unknown endpoint")
+            route = ROUTES.get((parts[1], len(parts) == 3))
+            if route is None:
+                raise ApiError(404, "Unknown endpoint")
+            path_id = None
+            if len(parts) == 3:
+                try:
+                    path_id = int(parts[2])
+                except ValueError:
+                    raise ApiError(400, f"Invalid id {parts[2]}")
+            status, payload = 200, route(
+                self.db, snapshot, path_id, parse_qs(url.query)
+            )
+        except ApiError as e:
+            status, payload = e.status, {"error": str(e)}
+        body = json.dumps(payload, default=str).encode()
+        return ApiResponse(status, body, gzip.compress(body))
+
+    def get_snapshot(self) -> Snapshot:
+        # Nothing else applies the change feed when the API runs on its own
+        sync_changes(self.db)
+        return get_snapshot(self.db)
+
+    def get(self, path: str) -> tuple[str, ApiResponse]:
+        snapshot = self.get_snapshot()
+        etag = get_etag(snapshot, path)
+        # Responses only change with the content, one render per digest
+        return etag, self.responses.get_or_compute(
+            etag, lambda: self.render(snapshot, path)
+        )
+
+    def get_etag(self, path: str) -> str:
+        return get_etag(self.get_snapshot(), path)
+
+    def get_readiness(self) -> ApiResponse:
+        # Never builds, load balancers poll it while the prewarm runs
+        snapshot = get_snapshot_publisher(self.db).latest()
+        if snapshot is None:
+            payload = {"ready": False}
+        else:
+            payload = {
+                "ready": True,
+                "dataVersion": snapshot.data_version,
+                "buildTime": snapshot.build_time,
+                "age": time.time() - snapshot.created_at,
+            }
+        body = json.dumps(payload).encode()
+        return ApiResponse(200 if snapshot is not None else 503, body, body)
+
+
+class ApiHandler(BaseHTTPRequestHandler):
+    server: "ApiServer"
+
+    def do_GET(self):
+        api = self.server.api
+        if urlsplit(self.path).path.rstrip("/") == READY_PATH:
+            self.send_body(api.get_readiness(), False)
+            return
+        if self.headers.get("If-None-Match") == api.get_etag(self.path):
+            self.send_response(304)
+            self.send_header("ETag", self.headers["If-None-Match"])
+            self.end_headers()
+            return
+
+        etag, response = api.get(self.path)
+        use_gzip = (
+            "gzip" in self.headers.get("Accept-Encoding", "")
+            and len(response.body) >= MIN_GZIP_SIZE
+        )
+        self.send_body(response, use_gzip, etag)
+
+    def send_body(
+        self, response: ApiResponse, use_gzip: bool, etag: Optional[str] = None
+    ):
+        body = response.gzipped if use_gzip else response.body
+        self.send_response(response.status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        if etag is not None:
+            self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.send_header("Vary", "Accept-Encoding")
+        if use_gzip:
+            self.send_header("Content-Encoding", "gzip")
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class ApiServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, port: int, api: DashboardApi):
+        super().__init__(("0.0.0.0", port), ApiHandler)
+        self.api = api
+
+
+_server: Optional[ApiServer] = None
+_server_lock = threading.Lock()
+
+
+def ensure_api_server(db: Prisma) -> Optional[ApiServer]:
+    # Kept at module level, clearing the singletons must not bind the port twice
+    global _server
+    if API_PORT == 0:
+        return None
+    with _server_lock:
+        if _server is None:
+            start_prewarm(db)
+            _server = ApiServer(API_PORT, DashboardApi(db))
+            threading.Thread(
+                target=_server.serve_forever, name="api", daemon=True
+            ).start()
+        _server.api.db = db
+    return _server
+
+
+def main():
+    from dotenv import load_dotenv
+
+    from utils.data import init_connection
+
+    load_dotenv()
+    parser = argparse.ArgumentParser(description="Serve the dashboard JSON API")
+    parser.add_argument("--port", type=int, default=API_PORT or 8502)
+    args = parser.parse_args()
+
+    db = init_connection()
+    start_prewarm(db)
+    server = ApiServer(args.port, DashboardApi(db))
+    print(f"Serving the API on port {args.port}")
+    server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,218 @@
+import threading
+import time
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+from typing import Optional
+
+import streamlit as st
+from prisma import Json, Prisma
+from prisma.models import AuditLog, LeagueMatch
+
+from utils.data import (
+    get_load_head,
+    refresh_matches,
+    refresh_players,
+    refresh_teams,
+    sync_seasons,
+)
+from utils.sheets import get_sheet_store
+
+SYNC_INTERVAL = 5.0
+# Audit ids are taken before commit, a missing id may still be committed by a
+# running batch, it is waited for this long before being given up
+GAP_TIMEOUT = 60.0
+
+MATCH_ENTITY = "LeagueMatch"
+TEAM_ENTITY = "LeagueTeam"
+PLAYER_ENTITY = "LeaguePlayer"
+
+
+class ConflictError(Exception):
+    def __init__(self, match_ids: list[int]):
+        super().__init__(f"Matches {match_ids} were modified by another admin")
+        self.match_ids = match_ids
+
+
+def get_author() -> str:
+    return st.session_state.get("username") or "unknown"
+
+
+def get_match_snapshot(match: LeagueMatch) -> dict:
+    return {
+        "title": match.title,
+        "defwin": match.defwin,
+        "addRed": match.addRed,
+        "addBlue": match.addBlue,
+        "replayURL": match.replayURL,
+        "periods": [p.id for p in match.periods or []],
+        "detail": [
+            {
+                "leagueTeamId": md.leagueTeamId,
+                "home": md.home,
+                "startsRed": md.startsRed,
+            }
+            for md in match.detail or []
+        ],
+        "version": match.version,
+    }
+
+
+def get_detail_snapshot(data_list: list[dict]) -> list[dict]:
+    return [
+        {
+            "leagueTeamId": data["leagueTeamId"],
+            "home": data["home"],
+            "startsRed": data["startsRed"],
+        }
+        for data in data_list
+    ]
+
+
+def get_changed(before: dict, after: dict) -> tuple[dict, dict]:
+    keys = [k for k in after if before.get(k) != after[k]]
+    return {k: before.get(k) for k in keys}, {k: after[k] for k in keys}
+
+
+def audit_data(
+    author: str,
+    action: str,
+    entity: str,
+    entity_id: int,
+    before: dict,
+    after: dict,
+) -> dict:
+    return {
+        "author": author,
+        "action": action,
+        "entity": entity,
+        "entityId": entity_id,
+        "before": Json(before),
+        "after": Json(after),
+    }
+
+
+def match_audit_data(author: str, action: str, match: LeagueMatch, **changes) -> dict:
+    before = get_match_snapshot(match)
+    after = {**before, **changes, "version": match.version + 1}
+    return audit_data(
+        author, action, MATCH_ENTITY, match.id, *get_changed(before, after)
+    )
+
+
+def release_matches(db: Prisma, versions: dict[int, int]):
+    if len(versions) == 0:
+        return
+    # Only undoes our own bump, a match claimed again since keeps its version
+    db.leaguematch.update_many(
+        where={"OR": [{"id": i, "version": v + 1} for i, v in versions.items()]},
+        data={"version": {"decrement": 1}},
+    )
+
+
+@contextmanager
+def claim_matches(db: Prisma, versions: dict[int, int]):
+    # Bumping the version is the lock: a concurrent edit made from the same
+    # version no longer matches and is rejected before writing anything.
+    # The claims are released if any match is taken or if the writes fail.
+    claimed: dict[int, int] = {}
+    try:
+        for match_id, version in sorted(versions.items()):
+            nb_claimed = db.leaguematch.update_many(
+                where={"id": match_id, "version": version},
+                data={"version": {"increment": 1}},
+            )
+            if nb_claimed != 1:
+                raise ConflictError(list(versions))
+            claimed[match_id] = version
+        yield
+    except Exception as e:
+        release_matches(db, claimed)
+        if isinstance(e, ConflictError):
+            refresh_matches(db, e.match_ids)
+        raise
+
+
+def get_changes(db: Prisma, since_id: int) -> list[AuditLog]:
+    return db.auditlog.find_many(
+        where={"id": {"gt": since_id}},
+        order={"id": "asc"},
+    )
+
+
+def get_entity_history(db: Prisma, entity: str, entity_id: int, limit: int = 20):
+    return db.auditlog.find_many(
+        where={"entity": entity, "entityId": entity_id},
+        order={"id": "desc"},
+        take=limit,
+    )
+
+
+@dataclass
+class ChangeFeed:
+    head: int
+    last_poll: float = 0.0
+    lock: threading.Lock = field(default_factory=threading.Lock)
+    # Applied ids above the head and missing ids with the time they were noticed
+    seen: set[int] = field(default_factory=set)
+    gaps: dict[int, float] = field(default_factory=dict)
+
+    def advance(self, ids: list[int], now: float):
+        # The head only passes an id once it was applied or given up
+        self.seen.update(ids)
+        for missing in range(self.head + 1, max(self.seen, default=self.head)):
+            if missing not in self.seen:
+                self.gaps.setdefault(missing, now)
+        while self.head + 1 in self.seen or self.is_given_up(self.head + 1, now):
+            self.head += 1
+            self.seen.discard(self.head)
+            self.gaps.pop(self.head, None)
+
+    def is_given_up(self, audit_id: int, now: float) -> bool:
+        return audit_id in self.gaps and now - self.gaps[audit_id] > GAP_TIMEOUT
+
+
+@st.experimental_singleton
+def get_change_feed(_db: Prisma) -> ChangeFeed:
+    return ChangeFeed(get_load_head(_db), time.monotonic())
+
+
+def apply_changes(db: Prisma, changes: list[AuditLog]):
+    entity_ids: dict[str, set[int]] = {}
+    nicks: set[str] = set()
+    for change in changes:
+        entity_ids.setdefault(change.entity, set()).add(change.entityId)
+        for values in [change.before, change.after]:
+            if not isinstance(values, dict):
+                continue
+            if change.entity == PLAYER_ENTITY:
+                nicks.update(values.get("nicks", []))
+            elif change.entity == TEAM_ENTITY and "leaguePlayerId" in values:
+                # The players keep their teams, they are stale as well
+                entity_ids.setdefault(PLAYER_ENTITY, set()).add(
+                    values["leaguePlayerId"]
+                )
+    if MATCH_ENTITY in entity_ids:
+        refresh_matches(db, list(entity_ids[MATCH_ENTITY]))
+    if TEAM_ENTITY in entity_ids:
+        refresh_teams(db, list(entity_ids[TEAM_ENTITY]))
+    if PLAYER_ENTITY in entity_ids:
+        players = refresh_players(db, list(entity_ids[PLAYER_ENTITY]))
+        get_sheet_store().reresolve(nicks, players)
+    return entity_ids
+
+
+def sync_changes(db: Prisma, force: bool = False) -> Optional[dict[str, set[int]]]:
+    feed = get_change_feed(db)
+    now = time.monotonic()
+    if not force and now - feed.last_poll < SYNC_INTERVAL:
+        return None
+    with feed.lock:
+        feed.last_poll = now
+        sync_seasons(db)
+        changes = [c for c in get_changes(db, feed.head) if c.id not in feed.seen]
+        if len(changes) == 0:
+            feed.advance([], now)
+            return None
+        entity_ids = apply_changes(db, changes)
+        feed.advance([c.id for c in changes], now)
+        return entity_ids
@@ -0,0 +1,213 @@
+import csv
+import io
+import json
+from dataclasses import dataclass, field
+from typing import Optional
+
+from prisma import Prisma
+from prisma.models import LeagueMatch, LeagueTeam
+from prisma.types import PeriodWhereUniqueInput
+
+from utils.admin import get_match_detail_data, get_title
+from utils.audit import claim_matches, get_detail_snapshot, match_audit_data
+from utils.data import get_period_links
+
+IMPORT_COLUMNS = [
+    "match_id",
+    "team1",
+    "team2",
+    "starts_red",
+    "period1",
+    "period2",
+    "period3",
+    "defwin",
+    "add_red",
+    "add_blue",
+    "replay_url",
+]
+
+
+@dataclass
+class MatchImportRow:
+    line: int
+    match_id: int
+    team1: Optional[str]
+    team2: Optional[str]
+    starts_red: int
+    periods: list[int] = field(default_factory=list)
+    defwin: int = 0
+    add_red: int = 0
+    add_blue: int = 0
+    replay_url: str = ""
+
+
+@dataclass
+class MatchImport:
+    row: MatchImportRow
+    match: LeagueMatch
+    teams: tuple[LeagueTeam, LeagueTeam]
+
+
+def to_int(value, default: int = 0) -> int:
+    if value is None or str(value).strip() == "":
+        return default
+    return int(str(value).strip())
+
+
+def to_str(value) -> Optional[str]:
+    if value is None or str(value).strip() == "":
+        return None
+    return str(value).strip()
+
+
+def parse_row(line: int, raw: dict) -> MatchImportRow:
+    if "periods" in raw and isinstance(raw["periods"], list):
+        periods = [to_int(p) for p in raw["periods"]]
+    else:
+        periods = [
+            to_int(raw.get(k))
+            for k in ["period1", "period2", "period3"]
+            if to_str(raw.get(k))
+        ]
+    return MatchImportRow(
+        line=line,
+        match_id=to_int(raw.get("match_id")),
+        team1=to_str(raw.get("team1")),
+        team2=to_str(raw.get("team2")),
+        starts_red=to_int(raw.get("starts_red"), 1),
+        periods=periods,
+        defwin=to_int(raw.get("defwin")),
+        add_red=to_int(raw.get("add_red")),
+        add_blue=to_int(raw.get("add_blue")),
+        replay_url=to_str(raw.get("replay_url")) or "",
+    )
+
+
+def parse_import_file(content: bytes, file_name: str):
+    rows: list[MatchImportRow] = []
+    errors: list[str] = []
+    try:
+        text = content.decode("utf-8-sig")
+        if file_name.lower().endswith(".json"):
+            raw_rows = json.loads(text)
+            first_line = 0
+        else:
+            raw_rows = list(csv.DictReader(io.StringIO(text)))
+            first_line = 2
+    except (UnicodeDecodeError, json.JSONDecodeError, csv.Error) as e:
+        return rows, [f"Invalid file: {e}"]
+    if not isinstance(raw_rows, list):
+        return rows, ["Invalid file: the JSON file must contain a list of rows"]
+    for i, raw in enumerate(raw_rows):
+        try:
+            rows.append(parse_row(first_line + i, raw))
+        except (ValueError, TypeError, AttributeError) as e:
+            errors.append(f"Row {first_line + i}: {e}")
+    return rows, errors
+
+
+def validate_import(
+    db: Prisma,
+    rows: list[MatchImportRow],
+    matches_by_id: dict[int, LeagueMatch],
+    teams: list[LeagueTeam],
+):
+    errors: list[str] = []
+    imports: list[MatchImport] = []
+    # Team names are only unique in their division
+    teams_by_name = {(t.leagueDivisionId, t.name): t for t in teams}
+
+    period_links = get_period_links(db, [p for row in rows for p in row.periods])
+    seen_matches: set[int] = set()
+    seen_periods: dict[int, int] = {}
+
+    for row in rows:
+        prefix = f"Row {row.line}"
+        nb_errors = len(errors)
+        match = matches_by_id.get(row.match_id)
+        if match is None:
+            errors.append(f"{prefix}: match {row.match_id} does not exist")
+            continue
+        if row.match_id in seen_matches:
+            errors.append(f"{prefix}: match {row.match_id} appears twice")
+        seen_matches.add(row.match_id)
+
+        team_names = [row.team1, row.team2]
+        for i in range(2):
+            if team_names[i] is None and len(match.detail) > i:
+                team_names[i] = match.detail[i].team.name
+        match_teams = []
+        for name in team_names:
+            team = teams_by_name.get((match.leagueDivisionId, name))
+            if team is None:
+                errors.append(f"{prefix}: unknown team {name} in the match division")
+            match_teams.append(team)
+        if team_names[0] is not None and team_names[0] == team_names[1]:
+            errors.append(f"{prefix}: a team cannot play against itself")
+
+        if row.starts_red not in (1, 2):
+            errors.append(f"{prefix}: starts_red must be 1 or 2")
+        if row.defwin not in (0, 1, 2):
+            errors.append(f"{prefix}: defwin must be 0, 1 or 2")
+        if len(row.periods) > 3:
+            errors.append(f"{prefix}: a match has at most 3 periods")
+        for period_id in row.periods:
+            if period_id not in period_links:
+                errors.append(f"{prefix}: period {period_id} does not exist")
+            elif period_links[period_id] not in (None, match.id):
+                errors.append(
+                    f"{prefix}: period {period_id} is already linked to "
+                    + f"match {period_links[period_id]}"
+                )
+            if period_id in seen_periods:
+                errors.append(
+                    f"{prefix}: period {period_id} is already used on row "
+                    + f"{seen_periods[period_id]}"
+                )
+            seen_periods[period_id] = row.line
+
+        # A row with any error is never applied, even when others are
+        if len(errors) == nb_errors:
+            imports.append(MatchImport(row, match, tuple(match_teams)))
+    return imports, errors
+
+
+def process_import(
+    db: Prisma, imports: list[MatchImport], versions: dict[int, int], author: str
+):
+    with claim_matches(db, versions), db.batch_() as batcher:
+        for match_import in imports:
+            row, match = match_import.row, match_import.match
+            periods: list[PeriodWhereUniqueInput] = [{"id": p} for p in row.periods]
+            detail_data = get_match_detail_data(
+                match.id, match_import.teams, row.starts_red == 1
+            )
+            title = get_title(match, match_import.teams)
+            batcher.leaguematchdetail.delete_many(where={"leagueMatchId": match.id})
+            batcher.leaguematchdetail.create_many(data=detail_data)
+            batcher.leaguematch.update(
+                where={"id": match.id},
+                data={
+                    "title": title,
+                    "defwin": row.defwin,
+                    "addRed": row.add_red,
+                    "addBlue": row.add_blue,
+                    "periods": {"set": periods},
+                    "replayURL": row.replay_url,
+                },
+            )
+            batcher.auditlog.create(
+                data=match_audit_data(
+                    author,
+                    "import",
+                    match,
+                    title=title,
+                    defwin=row.defwin,
+                    addRed=row.add_red,
+                    addBlue=row.add_blue,
+                    periods=row.periods,
+                    replayURL=row.replay_url,
+                    detail=get_detail_snapshot(detail_data),
+                )
+            )
+    return len(imports)
@@ -0,0 +1,255 @@
+import sys
+from typing import Any, Optional
+
+from prisma.models import (
+    Goal,
+    GoalDetail,
+    LeagueDivision,
+    LeagueMatch,
+    LeagueMatchDetail,
+    LeagueTeam,
+    Period,
+    Player,
+    PlayerStats,
+)
+
+STAT_FIELDS = (
+    "gametime",
+    "goals",
+    "ownGoals",
+    "assists",
+    "secondaryAssists",
+    "tertiaryAssists",
+    "shots",
+    "shotsTarget",
+    "saves",
+    "touches",
+    "kicks",
+    "interceptions",
+    "clears",
+    "duels",
+    "reboundDribbles",
+    "passesAttempted",
+    "passesSuccessful",
+    "goalsScoredTeam",
+    "goalsConcededTeam",
+    "averagePosX",
+    "averagePosY",
+    "gamePosition",
+)
+
+
+class Compact:
+    # Slot classes with the Prisma attribute names, so the code reading
+    # matches works on both representations
+    __slots__ = ()
+
+    def __init__(self, **values):
+        for name, value in values.items():
+            setattr(self, name, value)
+
+    def __repr__(self) -> str:
+        fields = ", ".join(
+            f"{name}={getattr(self, name)!r}"
+            for name in self.__slots__
+            if not isinstance(getattr(self, name, None), (list, tuple, Compact))
+        )
+        return f"{type(self).__name__}({fields})"
+
+    def to_dict(self) -> dict[str, Any]:
+        return {name: to_plain(getattr(self, name)) for name in self.__slots__}
+
+
+def to_plain(value):
+    if isinstance(value, Compact):
+        return value.to_dict()
+    if isinstance(value, (list, tuple)):
+        return [to_plain(v) for v in value]
+    return value
+
+
+class CompactDivision(Compact):
+    __slots__ = ("id", "name", "seasonId")
+
+
+class CompactTeam(Compact):
+    __slots__ = ("id", "leagueDivisionId", "name", "initials")
+
+
+class CompactMatchDetail(Compact):
+    __slots__ = ("leagueMatchId", "team", "leagueTeamId", "home", "startsRed")
+
+
+class CompactGoal(Compact):
+    __slots__ = ("id", "time", "passes")
+
+
+class CompactGoalDetail(Compact):
+    __slots__ = ("goal", "goalId", "playerId", "role", "own")
+
+
+class CompactPlayer(Compact):
+    __slots__ = ("id", "auth", "conn", "name", "team", "goalDetail")
+
+
+class CompactPlayerStats(Compact):
+    __slots__ = ("id", "periodId", "Player", "playerId") + STAT_FIELDS
+
+
+class CompactPeriod(Compact):
+    __slots__ = (
+        "id",
+        "gametime",
+        "scoreRed",
+        "scoreBlue",
+        "possessionRed",
+        "possessionBlue",
+        "actionZoneRed",
+        "actionZoneBlue",
+        "PlayerStats",
+        "leagueMatchId",
+    )
+
+
+class CompactMatch(Compact):
+    __slots__ = (
+        "id",
+        "date",
+        "matchday",
+        "gameNumber",
+        "title",
+        "LeagueDivision",
+        "leagueDivisionId",
+        "periods",
+        "defwin",
+        "addRed",
+        "addBlue",
+        "replayURL",
+        "detail",
+        "version",
+    )
+
+
+EMPTY: tuple = ()
+
+
+def intern(value: Optional[str]) -> Optional[str]:
+    return None if value is None else sys.intern(value)
+
+
+class MatchCompactor:
+    def __init__(self):
+        self.divisions: dict[int, CompactDivision] = {}
+        self.teams: dict[int, CompactTeam] = {}
+        self.goals: dict[str, CompactGoal] = {}
+
+    def division(self, division: Optional[LeagueDivision]):
+        if division is None:
+            return None
+        if division.id not in self.divisions:
+            self.divisions[division.id] = CompactDivision(
+                id=division.id,
+                name=intern(division.name),
+                seasonId=division.seasonId,
+            )
+        return self.divisions[division.id]
+
+    def team(self, team: Optional[LeagueTeam]):
+        if team is None:
+            return None
+        if team.id not in self.teams:
+            self.teams[team.id] = CompactTeam(
+                id=team.id,
+                leagueDivisionId=team.leagueDivisionId,
+                name=intern(team.name),
+                initials=intern(team.initials),
+            )
+        return self.teams[team.id]
+
+    def goal(self, goal: Optional[Goal]):
+        if goal is None:
+            return None
+        if goal.id not in self.goals:
+            self.goals[goal.id] = CompactGoal(
+                id=goal.id, time=goal.time, passes=goal.passes
+            )
+        return self.goals[goal.id]
+
+    def goal_detail(self, gd: GoalDetail) -> CompactGoalDetail:
+        return CompactGoalDetail(
+            goal=self.goal(gd.goal),
+            goalId=gd.goalId,
+            playerId=gd.playerId,
+            role=gd.role,
+            own=gd.own,
+        )
+
+    def player(self, player: Optional[Player]):
+        if player is None:
+            return None
+        goal_details = player.goalDetail or EMPTY
+        return CompactPlayer(
+            id=player.id,
+            auth=intern(player.auth),
+            conn=intern(player.conn),
+            name=intern(player.name),
+            team=player.team,
+            goalDetail=tuple(self.goal_detail(gd) for gd in goal_details) or EMPTY,
+        )
+
+    def player_stats(self, ps: PlayerStats) -> CompactPlayerStats:
+        stats = CompactPlayerStats(
+            id=ps.id,
+            periodId=ps.periodId,
+            Player=self.player(ps.Player),
+            playerId=ps.playerId,
+        )
+        for name in STAT_FIELDS:
+            setattr(stats, name, getattr(ps, name))
+        return stats
+
+    def period(self, period: Period) -> CompactPeriod:
+        return CompactPeriod(
+            id=period.id,
+            gametime=period.gametime,
+            scoreRed=period.scoreRed,
+            scoreBlue=period.scoreBlue,
+            possessionRed=period.possessionRed,
+            possessionBlue=period.possessionBlue,
+            actionZoneRed=period.actionZoneRed,
+            actionZoneBlue=period.actionZoneBlue,
+            PlayerStats=tuple(self.player_stats(ps) for ps in period.PlayerStats or []),
+            leagueMatchId=period.leagueMatchId,
+        )
+
+    def match_detail(self, md: LeagueMatchDetail) -> CompactMatchDetail:
+        return CompactMatchDetail(
+            leagueMatchId=md.leagueMatchId,
+            team=self.team(md.team),
+            leagueTeamId=md.leagueTeamId,
+            home=md.home,
+            startsRed=md.startsRed,
+        )
+
+    def match(self, match: LeagueMatch) -> CompactMatch:
+        return CompactMatch(
+            id=match.id,
+            date=match.date,
+            matchday=intern(match.matchday),
+            gameNumber=match.gameNumber,
+            title=match.title,
+            LeagueDivision=self.division(match.LeagueDivision),
+            leagueDivisionId=match.leagueDivisionId,
+            periods=[self.period(p) for p in match.periods or []],
+            defwin=match.defwin,
+            addRed=match.addRed,
+            addBlue=match.addBlue,
+            replayURL=match.replayURL,
+            detail=[self.match_detail(md) for md in match.detail or []],
+            version=match.version,
+        )
+
+
+def compact_matches(matches: list[LeagueMatch]) -> list[CompactMatch]:
+    compactor = MatchCompactor()
+    return [compactor.match(m) for m in matches]
@@ -1,29 +1,67 @@
+import hashlib
 import os
 import subprocess
+import sys
+import threading
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Optional
 
 import streamlit as st
 
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.prisma"
+
 
 def generate_prisma_client():
     print("GENERATING PRISMA CLIENT")
-    subprocess.call(["prisma", "generate"])
+    subprocess.call(["prisma", "generate", f"--schema={SCHEMA_PATH}"])
     print("GENERATED PRISMA CLIENT")
 
 
-generate_prisma_client()
+def unload_prisma():
+    # The package imported before the generation has no client attached
+    for name in list(sys.modules):
+        if name == "prisma" or name.startswith("prisma."):
+            del sys.modules[name]
+
+
+def get_schema_digest(schema: str) -> str:
+    return hashlib.sha1("".join(schema.split()).encode()).hexdigest()
+
 
+def is_prisma_client_outdated() -> bool:
+    # The generated client embeds the schema it was generated from, any
+    # change to schema.prisma since then needs a new client
+    try:
+        from prisma.client import SCHEMA
+    except (ImportError, RuntimeError):
+        return True
+    return get_schema_digest(SCHEMA) != get_schema_digest(SCHEMA_PATH.read_text())
 
-try:
-    from prisma import Prisma
-except RuntimeError:
+
+# The image ships a generated client, it is only generated when missing or
+# outdated
+if is_prisma_client_outdated():
     from prisma_cleanup import cleanup
 
     cleanup()
-    print("GOT RUNTIME ERROR")
+    print("PRISMA CLIENT OUTDATED")
     generate_prisma_client()
-    from prisma import Prisma
+    unload_prisma()
+
+from prisma import Prisma  # noqa: E402
+from prisma.models import (  # noqa
+    LeagueDivision,
+    LeagueMatch,
+    LeaguePlayer,
+    LeagueTeam,
+    Period,
+    Season,
+)
 
-from prisma.models import LeagueDivision  # noqa
+from utils.compact import CompactMatch, compact_matches  # noqa
+from utils.shared_cache import get_shared_cache, pack_matches, unpack_matches  # noqa
 
 
 @st.experimental_singleton
@@ -35,48 +73,119 @@ def init_connection():
         }
     )
     db.connect()
+    backfill_seasons(db)
     return db
 
 
 @st.experimental_singleton
-def get_matches(_db: Prisma):
-    matches = _db.leaguematch.find_many(
-        include={
-            "LeagueDivision": True,
-            "detail": {
-                "include": {
-                    "team": True,
-                }
-            },
-            "periods": {
+def get_data_version(_db: Prisma) -> int:
+    return time.time_ns()
+
+
+@st.experimental_singleton
+def get_players_version(_db: Prisma) -> int:
+    # Player names and team rosters, the views built from the matches alone
+    # stay valid when only they change
+    return time.time_ns()
+
+
+# Name of the season the divisions created before seasons are assigned to
+FIRST_SEASON = os.environ.get("FIRST_SEASON", "S10")
+
+MATCH_INCLUDE = {
+    "LeagueDivision": True,
+    "detail": {
+        "include": {
+            "team": True,
+        }
+    },
+    "periods": {
+        "include": {
+            "PlayerStats": {
                 "include": {
-                    "PlayerStats": {
+                    "Player": {
                         "include": {
-                            "Player": {
+                            "goalDetail": {
                                 "include": {
-                                    "goalDetail": {
-                                        "include": {
-                                            "goal": True,
-                                        }
-                                    },
+                                    "goal": True,
                                 }
                             },
                         }
-                    }
+                    },
                 }
-            },
+            }
+        }
+    },
+}
+
+TEAM_INCLUDE = {
+    "division": True,
+    "players": {
+        "include": {
+            "player": True,
+        }
+    },
+}
+
+PLAYER_INCLUDE = {
+    "teams": {
+        "include": {
+            "team": True,
+        }
+    }
+}
+
+
+def sort_match(match: LeagueMatch) -> LeagueMatch:
+    match.detail.sort(key=lambda d: not d.home)
+    match.periods.sort(key=lambda p: p.id)
+    return match
+
+
+def get_season_where(season_id: Optional[int]) -> dict:
+    if season_id is None:
+        return {}
+    return {"LeagueDivision": {"is": {"seasonId": season_id}}}
+
+
+def backfill_seasons(db: Prisma):
+    # Divisions created before seasons existed belong to the first season, it
+    # stays live unless a newer season was already added
+    if db.leaguedivision.count(where={"seasonId": None}) == 0:
+        return
+    season = db.season.upsert(
+        where={"name": FIRST_SEASON},
+        data={
+            "create": {"name": FIRST_SEASON, "completed": db.season.count() > 0},
+            "update": {},
         },
+    )
+    db.leaguedivision.update_many(
+        where={"seasonId": None},
+        data={"seasonId": season.id},
+    )
+
+
+def load_seasons(db: Prisma) -> list[Season]:
+    seasons = db.season.find_many(
+        order={"id": "asc"},
+    )
+    return seasons
+
+
+def load_matches(db: Prisma, season_id: Optional[int] = None) -> list[CompactMatch]:
+    matches = db.leaguematch.find_many(
+        where=get_season_where(season_id),
+        include=MATCH_INCLUDE,
         order={"id": "asc"},
     )
     for m in matches:
-        m.detail.sort(key=lambda d: not d.home)
-        m.periods.sort(key=lambda p: p.id)
-    return matches
+        sort_match(m)
+    return compact_matches(matches)
 
 
-@st.experimental_singleton
-def get_divisions(_db: Prisma) -> list[LeagueDivision]:
-    divisions = _db.leaguedivision.find_many(
+def load_divisions(db: Prisma) -> list[LeagueDivision]:
+    divisions = db.leaguedivision.find_many(
         include={
             "teams": True,
         },
@@ -85,40 +194,197 @@ def get_divisions(_db: Prisma) -> list[LeagueDivision]:
     return divisions
 
 
-@st.experimental_singleton
-def get_teams(_db: Prisma):
-    teams = _db.leagueteam.find_many(
-        include={
-            "division": True,
-            "players": {
-                "include": {
-                    "player": True,
-                }
-            },
-        },
+def load_teams(db: Prisma) -> list[LeagueTeam]:
+    teams = db.leagueteam.find_many(
+        include=TEAM_INCLUDE,
         order={"id": "asc"},
     )
     return teams
 
 
-@st.experimental_singleton
-def get_players(_db: Prisma):
-    players = _db.leagueplayer.find_many(
-        include={
-            "teams": {
-                "include": {
-                    "team": True,
-                }
-            }
-        },
+def load_players(db: Prisma) -> list[LeaguePlayer]:
+    players = db.leagueplayer.find_many(
+        include=PLAYER_INCLUDE,
         order={"id": "asc"},
     )
     return players
 
 
-@st.experimental_singleton
-def get_periods(_db: Prisma):
-    periods = _db.period.find_many(
+def load_periods(db: Prisma) -> list[Period]:
+    periods = db.period.find_many(
         order={"id": "asc"},
     )
     return periods
+
+
+@st.experimental_singleton
+def get_seasons(_db: Prisma) -> list[Season]:
+    return load_seasons(_db)
+
+
+def get_season_state(seasons: list[Season]) -> list[tuple]:
+    return [(s.id, s.name, s.completed) for s in seasons]
+
+
+def sync_seasons(db: Prisma) -> bool:
+    # Seasons are added and completed in the database, a new current season
+    # brings its own divisions, teams and matches
+    if get_season_state(load_seasons(db)) == get_season_state(get_seasons(db)):
+        return False
+    get_seasons.clear()
+    get_divisions.clear()
+    get_cached_teams.clear()
+    get_cached_matches.clear()
+    get_load_head.clear()
+    get_data_version.clear()
+    get_players_version.clear()
+    return True
+
+
+def get_current_season(db: Prisma) -> Optional[Season]:
+    # Only the last season still running is live, completed ones are frozen
+    seasons = get_seasons(db)
+    live = [s for s in seasons if not s.completed]
+    if len(live) > 0:
+        return live[-1]
+    return seasons[-1] if len(seasons) > 0 else None
+
+
+def get_current_season_id(db: Prisma) -> Optional[int]:
+    season = get_current_season(db)
+    return None if season is None else season.id
+
+
+def get_season_divisions(
+    divisions: list[LeagueDivision], season_id: Optional[int]
+) -> list[LeagueDivision]:
+    if season_id is None:
+        return divisions
+    return [d for d in divisions if d.seasonId == season_id]
+
+
+def get_season_teams(
+    teams: list[LeagueTeam], season_id: Optional[int]
+) -> list[LeagueTeam]:
+    if season_id is None:
+        return teams
+    return [t for t in teams if t.division.seasonId == season_id]
+
+
+def get_audit_head(db: Prisma) -> int:
+    last = db.auditlog.find_first(order={"id": "desc"})
+    return 0 if last is None else last.id
+
+
+@st.experimental_singleton
+def get_load_head(_db: Prisma) -> int:
+    # Read before the lists are loaded, the change feed replays anything newer
+    return get_audit_head(_db)
+
+
+@dataclass
+class CachedList:
+    # Patched by swapping the list, readers keep iterating a consistent one
+    items: list
+    lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+@st.experimental_singleton
+def get_cached_matches(_db: Prisma) -> CachedList:
+    season_id, head = get_current_season_id(_db), get_load_head(_db)
+    shared = get_shared_cache()
+    if shared is None:
+        return CachedList(load_matches(_db, season_id))
+    # Replicas at the same audit head share a single query
+    return CachedList(
+        shared.get_or_compute(
+            shared.key(f"matches-{season_id}", head),
+            lambda: load_matches(_db, season_id),
+            pack_matches,
+            unpack_matches,
+        )
+    )
+
+
+def get_matches(db: Prisma) -> list[CompactMatch]:
+    return get_cached_matches(db).items
+
+
+@st.experimental_singleton
+def get_divisions(_db: Prisma) -> list[LeagueDivision]:
+    return load_divisions(_db)
+
+
+@st.experimental_singleton
+def get_cached_teams(_db: Prisma) -> CachedList:
+    return CachedList(load_teams(_db))
+
+
+def get_teams(db: Prisma) -> list[LeagueTeam]:
+    return get_cached_teams(db).items
+
+
+@st.experimental_singleton
+def get_cached_players(_db: Prisma) -> CachedList:
+    return CachedList(load_players(_db))
+
+
+def get_players(db: Prisma) -> list[LeaguePlayer]:
+    return get_cached_players(db).items
+
+
+def get_period_links(db: Prisma, period_ids: list[int]) -> dict[int, Optional[int]]:
+    if len(period_ids) == 0:
+        return {}
+    periods = db.period.find_many(where={"id": {"in": list(set(period_ids))}})
+    return {p.id: p.leagueMatchId for p in periods}
+
+
+def patch_cached(cached: CachedList, ids: list, fresh: list):
+    fresh_by_id = {item.id: item for item in fresh}
+    removed_ids = set(ids) - set(fresh_by_id.keys())
+    with cached.lock:
+        items = [
+            fresh_by_id.pop(item.id, item)
+            for item in cached.items
+            if item.id not in removed_ids
+        ]
+        items.extend(fresh_by_id.values())
+        items.sort(key=lambda item: item.id)
+        cached.items = items
+    return items
+
+
+def refresh_matches(db: Prisma, match_ids: list[int]):
+    # Matches of frozen seasons are never brought back in the live list
+    fresh = db.leaguematch.find_many(
+        where={
+            "id": {"in": match_ids},
+            **get_season_where(get_current_season_id(db)),
+        },
+        include=MATCH_INCLUDE,
+    )
+    fresh = compact_matches([sort_match(m) for m in fresh])
+    matches = patch_cached(get_cached_matches(db), match_ids, fresh)
+    get_data_version.clear()
+    return matches
+
+
+def refresh_teams(db: Prisma, team_ids: list[int]):
+    fresh = db.leagueteam.find_many(
+        where={"id": {"in": team_ids}},
+        include=TEAM_INCLUDE,
+    )
+    teams = patch_cached(get_cached_teams(db), team_ids, fresh)
+    get_players_version.clear()
+    return teams
+
+
+def refresh_players(db: Prisma, player_ids: list[int]):
+    fresh = db.leagueplayer.find_many(
+        where={"id": {"in": player_ids}},
+        include=PLAYER_INCLUDE,
+    )
+    players = patch_cached(get_cached_players(db), player_ids, fresh)
+    get_players_version.clear()
+    return players
@@ -0,0 +1,112 @@
+import io
+from dataclasses import dataclass
+from typing import Callable, Hashable
+
+import polars as pl
+import streamlit as st
+
+from utils.stats import get_source_columns, sheet_value
+from utils.utils import PlayerStatSheet
+
+
+def write_excel(df: pl.DataFrame) -> bytes:
+    # pandas and xlsxwriter are only loaded for Excel downloads
+    import pandas as pd
+
+    buffer = io.BytesIO()
+    with pd.ExcelWriter(buffer, engine="xlsxwriter") as writer:
+        df.to_pandas().to_excel(writer, sheet_name="Sheet1", index=False)
+    return buffer.getvalue()
+
+
+def write_csv(df: pl.DataFrame) -> bytes:
+    return df.write_csv().encode("utf-8")
+
+
+def write_parquet(df: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.write_parquet(buffer)
+    return buffer.getvalue()
+
+
+def write_ipc(df: pl.DataFrame) -> bytes:
+    buffer = io.BytesIO()
+    df.write_ipc(buffer)
+    return buffer.getvalue()
+
+
+@dataclass(frozen=True)
+class ExportFormat:
+    name: str
+    extension: str
+    mime: str
+    writer: Callable[[pl.DataFrame], bytes]
+
+
+EXPORT_FORMATS: dict[str, ExportFormat] = {
+    "xlsx": ExportFormat("Excel", "xlsx", "application/vnd.ms-excel", write_excel),
+    "csv": ExportFormat("CSV", "csv", "text/csv", write_csv),
+    "parquet": ExportFormat(
+        "Parquet", "parquet", "application/octet-stream", write_parquet
+    ),
+    "arrow": ExportFormat(
+        "Arrow IPC", "arrow", "application/vnd.apache.arrow.file", write_ipc
+    ),
+}
+
+
+def build_period_export(period_sheets: list[PlayerStatSheet]) -> pl.DataFrame:
+    data = {
+        "periodId": [pss.stats.periodId for pss in period_sheets],
+        "name": [pss.player_name for pss in period_sheets],
+        "team": [pss.team.name for pss in period_sheets],
+        "periodTeam": [pss.period_team for pss in period_sheets],
+    }
+    for source in get_source_columns():
+        data[source] = [sheet_value(pss, source) for pss in period_sheets]
+    return pl.DataFrame(data)
+
+
+@st.experimental_memo(max_entries=64, show_spinner=False)
+def export_frame(
+    filter_key: Hashable,
+    version: Hashable,
+    fmt: str,
+    _build: Callable[[], pl.DataFrame],
+) -> bytes:
+    return EXPORT_FORMATS[fmt].writer(_build())
+
+
+def display_export(
+    filter_key: Hashable,
+    version: Hashable,
+    datasets: dict[str, Callable[[], pl.DataFrame]],
+    file_name: str,
+):
+    col1, col2, col3 = st.columns([4, 3, 5])
+    with col1:
+        dataset = st.selectbox("Export data", list(datasets.keys()))
+    with col2:
+        fmt = st.selectbox(
+            "Format",
+            list(EXPORT_FORMATS.keys()),
+            format_func=lambda f: EXPORT_FORMATS[f].name,
+        )
+    export_key = (filter_key, dataset, fmt)
+    with col3:
+        st.write("")
+        st.write("")
+        if st.button("Prepare export"):
+            st.session_state["export_key"] = export_key
+
+    if st.session_state.get("export_key") != export_key:
+        return
+
+    export_format = EXPORT_FORMATS[fmt]
+    data = export_frame((filter_key, dataset), version, fmt, datasets[dataset])
+    st.download_button(
+        label=f"Download {dataset.lower()} as {export_format.name}",
+        data=data,
+        file_name=f"{file_name}.{export_format.extension}",
+        mime=export_format.mime,
+    )
@@ -0,0 +1,251 @@
+import argparse
+import json
+import os
+import re
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterator, Optional
+
+from dotenv import load_dotenv
+from prisma import Prisma
+
+SCHEMA_PATH = Path(__file__).resolve().parent.parent / "schema.prisma"
+
+PRISMA_TYPES = {
+    "Int": (int,),
+    "BigInt": (int,),
+    "Float": (int, float),
+    "String": (str,),
+    "Boolean": (bool,),
+}
+
+# Room dump layout, one period per file:
+# {<Period fields>, "players": [{<Player fields>, "stats": {<PlayerStats fields>}}],
+#  "goals": [{<Goal fields>, "detail": [{"playerId", "role", "own"}]}]}
+# Missing Player/Goal/PlayerStats ids are derived from the period id, so
+# re-ingesting the same file produces the same rows. A player without an id
+# gets "{period_id}-p{i}" (i its index in "players"), and GoalDetail.playerId
+# must then use that derived id.
+
+
+def parse_schema(path: Path = SCHEMA_PATH) -> dict[str, dict[str, str]]:
+    models: dict[str, dict[str, str]] = {}
+    for name, body in re.findall(r"model (\w+) \{(.*?)\n\}", path.read_text(), re.S):
+        fields = {}
+        for line in body.strip().splitlines():
+            parts = line.split()
+            if len(parts) < 2 or parts[0].startswith("@@"):
+                continue
+            if parts[1] in PRISMA_TYPES:
+                fields[parts[0]] = parts[1]
+        models[name] = fields
+    return models
+
+
+@dataclass
+class PeriodRows:
+    period: dict
+    players: list[dict]
+    stats: list[dict]
+    goals: list[dict]
+    goal_details: list[dict]
+
+    @property
+    def nb_rows(self) -> int:
+        return (
+            1
+            + len(self.players)
+            + len(self.stats)
+            + len(self.goals)
+            + len(self.goal_details)
+        )
+
+
+@dataclass
+class IngestReport:
+    files: int = 0
+    periods_inserted: int = 0
+    periods_skipped: int = 0
+    rows_inserted: int = 0
+    errors: list[str] = field(default_factory=list)
+    elapsed: float = 0.0
+
+    @property
+    def periods_per_second(self) -> float:
+        return self.periods_inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+    @property
+    def rows_per_second(self) -> float:
+        return self.rows_inserted / self.elapsed if self.elapsed > 0 else 0.0
+
+    def summary(self) -> str:
+        return (
+            f"{self.files} files, {self.periods_inserted} periods inserted, "
+            + f"{self.periods_skipped} skipped, {len(self.errors)} invalid, "
+            + f"{self.rows_inserted} rows in {self.elapsed:.1f}s "
+            + f"({self.periods_per_second:.1f} periods/s, "
+            + f"{self.rows_per_second:.0f} rows/s)"
+        )
+
+
+def validate_fields(
+    record: dict,
+    model: str,
+    schema: dict[str, dict[str, str]],
+    exclude: tuple[str, ...] = (),
+) -> dict:
+    data = {}
+    for name, prisma_type in schema[model].items():
+        if name in exclude:
+            continue
+        if name not in record:
+            raise ValueError(f"{model}.{name} is missing")
+        value = record[name]
+        if isinstance(value, bool) and prisma_type != "Boolean":
+            raise ValueError(f"{model}.{name} should be {prisma_type}")
+        if not isinstance(value, PRISMA_TYPES[prisma_type]):
+            raise ValueError(f"{model}.{name} should be {prisma_type}")
+        data[name] = value
+    return data
+
+
+def build_period_rows(raw: dict, schema: dict[str, dict[str, str]]) -> PeriodRows:
+    period = validate_fields(raw, "Period", schema, exclude=("leagueMatchId",))
+    period_id = period["id"]
+
+    players, stats, player_ids = [], [], set()
+    for i, raw_player in enumerate(raw.get("players", [])):
+        player = validate_fields(
+            {"id": f"{period_id}-p{i}", **raw_player}, "Player", schema
+        )
+        player_ids.add(player["id"])
+        players.append(player)
+        player_stats = validate_fields(
+            {
+                "id": f"{period_id}-s{i}",
+                **raw_player.get("stats", {}),
+                "periodId": period_id,
+                "playerId": player["id"],
+            },
+            "PlayerStats",
+            schema,
+        )
+        stats.append(player_stats)
+
+    goals, goal_details = [], []
+    for i, raw_goal in enumerate(raw.get("goals", [])):
+        goal = validate_fields({"id": f"{period_id}-g{i}", **raw_goal}, "Goal", schema)
+        goals.append(goal)
+        for raw_detail in raw_goal.get("detail", []):
+            detail = validate_fields(
+                {**raw_detail, "goalId": goal["id"]}, "GoalDetail", schema
+            )
+            if detail["playerId"] not in player_ids:
+                raise ValueError(f"Goal {goal['id']} refers to unknown player")
+            goal_details.append(detail)
+
+    return PeriodRows(period, players, stats, goals, goal_details)
+
+
+def iter_period_files(directory: Path) -> Iterator[Path]:
+    # Sorted for reproducible runs; only paths are kept in memory
+    yield from sorted(directory.glob("*.json"))
+
+
+def iter_batches(
+    paths: Iterator[Path],
+    schema: dict[str, dict[str, str]],
+    report: IngestReport,
+    batch_size: int,
+) -> Iterator[list[PeriodRows]]:
+    batch: list[PeriodRows] = []
+    for path in paths:
+        report.files += 1
+        try:
+            with open(path) as file:
+                batch.append(build_period_rows(json.load(file), schema))
+        except (OSError, ValueError, TypeError, KeyError, AttributeError) as e:
+            report.errors.append(f"{path.name}: {e}")
+            continue
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if len(batch) > 0:
+        yield batch
+
+
+def insert_batch(db: Prisma, batch: list[PeriodRows], report: IngestReport):
+    period_ids = [rows.period["id"] for rows in batch]
+    existing = db.period.find_many(where={"id": {"in": period_ids}})
+    existing_ids = {p.id for p in existing}
+    new_rows = [rows for rows in batch if rows.period["id"] not in existing_ids]
+    report.periods_skipped += len(batch) - len(new_rows)
+    if len(new_rows) == 0:
+        return
+
+    with db.batch_() as batcher:
+        batcher.period.create_many(
+            data=[rows.period for rows in new_rows], skip_duplicates=True
+        )
+        batcher.player.create_many(
+            data=[p for rows in new_rows for p in rows.players],
+            skip_duplicates=True,
+        )
+        batcher.playerstats.create_many(
+            data=[s for rows in new_rows for s in rows.stats],
+            skip_duplicates=True,
+        )
+        batcher.goal.create_many(
+            data=[g for rows in new_rows for g in rows.goals],
+            skip_duplicates=True,
+        )
+        batcher.goaldetail.create_many(
+            data=[gd for rows in new_rows for gd in rows.goal_details],
+            skip_duplicates=True,
+        )
+    report.periods_inserted += len(new_rows)
+    report.rows_inserted += sum(rows.nb_rows for rows in new_rows)
+
+
+def ingest_directory(
+    db: Prisma,
+    directory: Path,
+    batch_size: int = 200,
+    verbose: bool = True,
+    schema: Optional[dict[str, dict[str, str]]] = None,
+) -> IngestReport:
+    schema = schema if schema is not None else parse_schema()
+    report = IngestReport()
+    start = time.perf_counter()
+    paths = iter_period_files(directory)
+    for batch in iter_batches(paths, schema, report, batch_size):
+        insert_batch(db, batch, report)
+        report.elapsed = time.perf_counter() - start
+        if verbose:
+            print(report.summary())
+    report.elapsed = time.perf_counter() - start
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Ingest room period dumps")
+    parser.add_argument("directory", type=Path)
+    parser.add_argument("--batch-size", type=int, default=200)
+    args = parser.parse_args()
+
+    load_dotenv()
+    db = Prisma(datasource={"url": os.environ["DATABASE_URL"]})
+    db.connect()
+    try:
+        report = ingest_directory(db, args.directory, args.batch_size)
+    finally:
+        db.disconnect()
+
+    print(report.summary())
+    for error in report.errors:
+        print(error)
+
+
+if __name__ == "__main__":
+    main()
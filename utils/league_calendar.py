@@ -0,0 +1,102 @@
+from dataclasses import dataclass
+from typing import Callable
+
+import streamlit as st
+from prisma.models import LeagueMatch
+
+from utils.cache import LRUCache
+from utils.utils import is_match_played
+
+
+@dataclass
+class DivisionCalendar:
+    matchdays: list[str]
+    ordinals: dict[str, int]
+    match_ids: list[int]
+    offsets: list[int]
+    last_played: int
+
+
+class LeagueCalendar:
+    def __init__(self, matches: list[LeagueMatch]):
+        self.matches_by_id: dict[int, LeagueMatch] = {m.id: m for m in matches}
+        self.match_ordinal: dict[int, int] = {}
+        self.divisions: dict[int, DivisionCalendar] = {}
+
+        matchdays_div: dict[int, dict[str, list[LeagueMatch]]] = {}
+        for m in matches:
+            div_matchdays = matchdays_div.setdefault(m.leagueDivisionId, {})
+            div_matchdays.setdefault(m.matchday, []).append(m)
+
+        for div_id, div_matchdays in matchdays_div.items():
+            matchdays = list(div_matchdays.keys())
+            match_ids, offsets = [], [0]
+            first_not_played = None
+            for i, md in enumerate(matchdays):
+                for m in div_matchdays[md]:
+                    self.match_ordinal[m.id] = i
+                    match_ids.append(m.id)
+                    if first_not_played is None and not is_match_played(m):
+                        first_not_played = i
+                offsets.append(len(match_ids))
+            if first_not_played is None:
+                last_played = len(matchdays) - 1
+            else:
+                last_played = max(0, first_not_played - 1)
+            self.divisions[div_id] = DivisionCalendar(
+                matchdays,
+                {md: i for i, md in enumerate(matchdays)},
+                match_ids,
+                offsets,
+                last_played,
+            )
+
+    def matchdays(self, division_id: int) -> list[str]:
+        if division_id not in self.divisions:
+            return []
+        return self.divisions[division_id].matchdays
+
+    def ordinal(self, division_id: int, matchday: str) -> int:
+        return self.divisions[division_id].ordinals[matchday]
+
+    def last_played(self, division_id: int) -> int:
+        if division_id not in self.divisions:
+            return 0
+        return self.divisions[division_id].last_played
+
+    def matches_in_range(self, division_id: int, start: int, end: int) -> list[int]:
+        if division_id not in self.divisions:
+            return []
+        div_calendar = self.divisions[division_id]
+        start = max(0, start)
+        end = min(end, len(div_calendar.matchdays) - 1)
+        if start > end:
+            return []
+        return div_calendar.match_ids[
+            div_calendar.offsets[start] : div_calendar.offsets[end + 1]
+        ]
+
+    def matches_on(self, division_id: int, matchday: str) -> list[int]:
+        if division_id not in self.divisions:
+            return []
+        ordinal = self.divisions[division_id].ordinals.get(matchday)
+        if ordinal is None:
+            return []
+        return self.matches_in_range(division_id, ordinal, ordinal)
+
+    def get_matches(self, match_ids: list[int]) -> list[LeagueMatch]:
+        return [self.matches_by_id[i] for i in match_ids]
+
+
+@st.experimental_singleton
+def get_calendar_cache() -> LRUCache:
+    return LRUCache(maxsize=4)
+
+
+def get_league_calendar(
+    get_matches_fn: Callable[[], list[LeagueMatch]], data_version: int
+) -> LeagueCalendar:
+    return get_calendar_cache().get_or_compute(
+        data_version,
+        lambda: LeagueCalendar(get_matches_fn()),
+    )
@@ -0,0 +1,137 @@
+from dataclasses import dataclass
+from typing import Optional
+
+from prisma import Prisma
+from prisma.models import LeagueMatch, LeaguePlayer, Period
+
+from utils.bulk_import import MatchImportRow
+from utils.league_calendar import LeagueCalendar
+from utils.utils import get_nick_index, is_match_played
+
+ACTIVE_WEIGHT = 1.0
+FORMER_WEIGHT = 0.25
+
+
+@dataclass
+class PeriodSuggestion:
+    period: Period
+    match: LeagueMatch
+    score: float
+    red_team_id: int
+    unknown_players: int
+
+
+def get_unlinked_periods(db: Prisma) -> list[Period]:
+    return db.period.find_many(
+        where={"leagueMatchId": None},
+        include={"PlayerStats": {"include": {"Player": True}}},
+        order={"id": "asc"},
+    )
+
+
+def get_player_teams(players: list[LeaguePlayer]) -> dict[int, dict[int, float]]:
+    player_teams: dict[int, dict[int, float]] = {}
+    for p in players:
+        weights = {}
+        for tp in p.teams or []:
+            weights[tp.leagueTeamId] = ACTIVE_WEIGHT if tp.active else FORMER_WEIGHT
+        player_teams[p.id] = weights
+    return player_teams
+
+
+def get_candidate_index(calendar: LeagueCalendar) -> dict[int, list[LeagueMatch]]:
+    candidates: dict[int, list[LeagueMatch]] = {}
+    for match in calendar.matches_by_id.values():
+        if len(match.detail) < 2 or is_match_played(match):
+            continue
+        for md in match.detail:
+            candidates.setdefault(md.leagueTeamId, []).append(match)
+    return candidates
+
+
+def score_period(
+    period: Period,
+    nick_index: dict[str, LeaguePlayer],
+    player_teams: dict[int, dict[int, float]],
+    candidates: dict[int, list[LeagueMatch]],
+    calendar: LeagueCalendar,
+) -> Optional[PeriodSuggestion]:
+    sides: dict[int, dict[int, float]] = {1: {}, 2: {}}
+    nb_players, unknown = 0, 0
+    for ps in period.PlayerStats or []:
+        side = ps.Player.team
+        if side not in sides:
+            continue
+        nb_players += 1
+        lp = nick_index.get(ps.Player.name.strip().lower())
+        if lp is None:
+            unknown += 1
+            continue
+        for team_id, weight in player_teams.get(lp.id, {}).items():
+            sides[side][team_id] = sides[side].get(team_id, 0) + weight
+    if nb_players == 0:
+        return None
+
+    matches = {
+        m.id: m
+        for team_id in {**sides[1], **sides[2]}
+        for m in candidates.get(team_id, [])
+    }
+    best: Optional[PeriodSuggestion] = None
+    for match in matches.values():
+        team_1, team_2 = match.detail[0].leagueTeamId, match.detail[1].leagueTeamId
+        score_1_red = sides[1].get(team_1, 0) + sides[2].get(team_2, 0)
+        score_2_red = sides[1].get(team_2, 0) + sides[2].get(team_1, 0)
+        score = max(score_1_red, score_2_red) / nb_players
+        red_team_id = team_1 if score_1_red >= score_2_red else team_2
+        suggestion = PeriodSuggestion(period, match, score, red_team_id, unknown)
+        if best is None or (score, -calendar.match_ordinal[match.id]) > (
+            best.score,
+            -calendar.match_ordinal[best.match.id],
+        ):
+            best = suggestion
+    return best
+
+
+def suggest_periods(
+    periods: list[Period],
+    players: list[LeaguePlayer],
+    calendar: LeagueCalendar,
+) -> list[PeriodSuggestion]:
+    nick_index = get_nick_index(players)
+    player_teams = get_player_teams(players)
+    candidates = get_candidate_index(calendar)
+    suggestions = []
+    for period in periods:
+        suggestion = score_period(
+            period, nick_index, player_teams, candidates, calendar
+        )
+        if suggestion is not None:
+            suggestions.append(suggestion)
+    return suggestions
+
+
+def get_suggested_imports(
+    suggestions: list[PeriodSuggestion], min_score: float
+) -> list[MatchImportRow]:
+    periods_match: dict[int, list[PeriodSuggestion]] = {}
+    for s in suggestions:
+        if s.score >= min_score:
+            periods_match.setdefault(s.match.id, []).append(s)
+    rows = []
+    for i, (match_id, match_suggestions) in enumerate(periods_match.items()):
+        match_suggestions.sort(key=lambda s: s.period.id)
+        first = match_suggestions[0]
+        team_1_red = first.red_team_id == first.match.detail[0].leagueTeamId
+        rows.append(
+            MatchImportRow(
+                line=i + 1,
+                match_id=match_id,
+                team1=None,
+                team2=None,
+                starts_red=1 if team_1_red else 2,
+                periods=[s.period.id for s in match_suggestions],
+                replay_url=first.match.replayURL,
+            )
+        )
+    return rows
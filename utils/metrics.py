@@ -0,0 +1,113 @@
+import os
+import threading
+import time
+from collections import deque
+from dataclasses import dataclass, field
+from typing import Optional
+
+import streamlit as st
+
+METRICS_ENABLED = os.environ.get("DASHBOARD_METRICS", "0") == "1"
+MAX_SAMPLES = 1000
+
+
+@dataclass
+class StepMetrics:
+    durations: deque = field(default_factory=lambda: deque(maxlen=MAX_SAMPLES))
+    count: int = 0
+    total: float = 0.0
+    rows: int = 0
+
+
+class MetricsStore:
+    def __init__(self):
+        self._steps: dict[str, StepMetrics] = {}
+        self._lock = threading.Lock()
+
+    def record(self, step: str, duration: float, rows: int = 0):
+        with self._lock:
+            metrics = self._steps.setdefault(step, StepMetrics())
+            metrics.durations.append(duration)
+            metrics.count += 1
+            metrics.total += duration
+            metrics.rows += rows
+
+    def clear(self):
+        with self._lock:
+            self._steps.clear()
+
+    def summary(self) -> list[dict]:
+        with self._lock:
+            steps = {k: (sorted(m.durations), m) for k, m in self._steps.items()}
+        rows = []
+        for step, (durations, metrics) in sorted(steps.items()):
+            rows.append(
+                {
+                    "step": step,
+                    "count": metrics.count,
+                    "p50 (ms)": 1000 * get_percentile(durations, 0.5),
+                    "p90 (ms)": 1000 * get_percentile(durations, 0.9),
+                    "p99 (ms)": 1000 * get_percentile(durations, 0.99),
+                    "total (s)": metrics.total,
+                    "rows": metrics.rows,
+                }
+            )
+        return rows
+
+
+def get_percentile(sorted_values: list[float], q: float) -> float:
+    if len(sorted_values) == 0:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(q * len(sorted_values)))]
+
+
+@st.experimental_singleton
+def get_metrics_store() -> MetricsStore:
+    return MetricsStore()
+
+
+class Timer:
+    __slots__ = ("step", "rows", "start")
+
+    def __init__(self, step: str):
+        self.step = step
+        self.rows = 0
+        self.start = 0.0
+
+    def add_rows(self, rows: int):
+        self.rows += rows
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, *args):
+        get_metrics_store().record(
+            self.step, time.perf_counter() - self.start, self.rows
+        )
+
+
+class NoopTimer:
+    __slots__ = ()
+
+    def add_rows(self, rows: int):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+NOOP_TIMER = NoopTimer()
+
+
+def timed(step: str, rows: Optional[int] = None):
+    # Disabled metrics cost one call and a shared no-op context manager
+    if not METRICS_ENABLED:
+        return NOOP_TIMER
+    timer = Timer(step)
+    if rows is not None:
+        timer.rows = rows
+    return timer
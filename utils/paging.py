@@ -0,0 +1,114 @@
+import math
+from dataclasses import dataclass, replace
+from typing import Optional
+
+import polars as pl
+import streamlit as st
+
+PAGE_SIZES = [10, 25, 50, 100]
+
+
+@dataclass(frozen=True)
+class PageRequest:
+    page: int
+    page_size: int
+    sort_by: Optional[str] = None
+    descending: bool = False
+    search: str = ""
+    search_column: Optional[str] = None
+
+
+def filter_table(df: pl.DataFrame, request: PageRequest) -> pl.DataFrame:
+    if request.search_column is not None and request.search.strip() != "":
+        pattern = request.search.strip().lower()
+        df = df.filter(
+            pl.col(request.search_column)
+            .str.to_lowercase()
+            .str.contains(pattern, literal=True)
+        )
+    if request.sort_by is not None:
+        df = df.sort(request.sort_by, reverse=request.descending, nulls_last=True)
+    return df
+
+
+def get_page(df: pl.DataFrame, request: PageRequest) -> pl.DataFrame:
+    return df.slice((request.page - 1) * request.page_size, request.page_size)
+
+
+def get_nb_pages(nb_rows: int, page_size: int) -> int:
+    return max(1, math.ceil(nb_rows / page_size))
+
+
+def select_sort(
+    df: pl.DataFrame,
+    key: str,
+    default_sort: Optional[str] = None,
+    search_column: Optional[str] = None,
+):
+    columns = df.columns
+    col1, col2, col3 = st.columns([5, 4, 2])
+    with col1:
+        search = ""
+        if search_column is not None:
+            search = st.text_input(f"Search {search_column}", "", key=f"{key}_search")
+    with col2:
+        sort_by = st.selectbox(
+            "Sort by",
+            [None] + columns,
+            index=0 if default_sort is None else columns.index(default_sort) + 1,
+            format_func=lambda c: "-" if c is None else c,
+            key=f"{key}_sort",
+        )
+    with col3:
+        st.write("")
+        st.write("")
+        descending = st.checkbox("Desc.", sort_by is not None, key=f"{key}_desc")
+    return sort_by, descending, search
+
+
+def select_page(nb_rows: int, key: str, default_page_size: int):
+    page_sizes = sorted(set(PAGE_SIZES + [default_page_size]))
+    col1, col2, col3 = st.columns([3, 3, 6])
+    with col1:
+        page_size = st.selectbox(
+            "Rows per page",
+            page_sizes,
+            index=page_sizes.index(default_page_size),
+            key=f"{key}_page_size",
+        )
+    nb_pages = get_nb_pages(nb_rows, page_size)
+    with col2:
+        page = st.number_input(
+            f"Page (1-{nb_pages})",
+            min_value=1,
+            max_value=nb_pages,
+            value=1,
+            step=1,
+            key=f"{key}_page_{page_size}_{nb_rows}",
+        )
+    with col3:
+        st.write("")
+        st.write("")
+        st.caption(f"{nb_rows} rows")
+    return int(page), page_size
+
+
+def paginate_table(
+    df: pl.DataFrame,
+    key: str,
+    default_page_size: int = 25,
+    default_sort: Optional[str] = None,
+    search_column: Optional[str] = None,
+) -> pl.DataFrame:
+    sort_by, descending, search = select_sort(df, key, default_sort, search_column)
+    request = PageRequest(
+        page=1,
+        page_size=default_page_size,
+        sort_by=sort_by,
+        descending=descending,
+        search=search,
+        search_column=search_column,
+    )
+    df_filter = filter_table(df, request)
+    page, page_size = select_page(len(df_filter), key, default_page_size)
+    return get_page(df_filter, replace(request, page=page, page_size=page_size))
@@ -0,0 +1,105 @@
+import threading
+from typing import TYPE_CHECKING, Optional
+
+import streamlit as st
+from prisma import Prisma
+from prisma.models import Season
+
+from utils.data import (
+    get_current_season,
+    get_divisions,
+    get_players,
+    get_season_divisions,
+    get_seasons,
+    get_teams,
+    load_matches,
+)
+from utils.metrics import timed
+from utils.shared_cache import get_shared_cache, pack_matches, unpack_matches
+
+if TYPE_CHECKING:
+    from utils.snapshots import Snapshot
+
+FROZEN_VERSION = 0
+
+
+def load_season_matches(db: Prisma, season: Season):
+    shared = get_shared_cache()
+    if shared is None:
+        return load_matches(db, season.id)
+    # A completed season never changes, its entry is never invalidated
+    return shared.get_or_compute(
+        shared.key(f"season-{season.id}"),
+        lambda: load_matches(db, season.id),
+        pack_matches,
+        unpack_matches,
+    )
+
+
+def freeze_season(db: Prisma, season: Season) -> "Snapshot":
+    from utils.snapshots import build_season_snapshot
+
+    return build_season_snapshot(
+        load_season_matches(db, season),
+        get_season_divisions(get_divisions(db), season.id),
+        get_teams(db),
+        get_players(db),
+        (FROZEN_VERSION, FROZEN_VERSION),
+        f"season-standings-{season.id}",
+    )
+
+
+class SeasonArchive:
+    def __init__(self):
+        self._snapshots: dict[int, "Snapshot"] = {}
+        self._lock = threading.Lock()
+
+    def get(self, db: Prisma, season: Season) -> "Snapshot":
+        with self._lock:
+            snapshot = self._snapshots.get(season.id)
+            if snapshot is None:
+                with timed("season.freeze"):
+                    snapshot = freeze_season(db, season)
+                self._snapshots[season.id] = snapshot
+            return snapshot
+
+
+# Kept at module level, reloading the data clears the singletons but past
+# seasons are never queried again
+_archive = SeasonArchive()
+
+
+def is_live(db: Prisma, season: Optional[Season]) -> bool:
+    current = get_current_season(db)
+    return season is None or current is None or season.id == current.id
+
+
+def get_season_snapshot(db: Prisma, season: Optional[Season]) -> "Snapshot":
+    # Imported on use, the teams page only needs the season selector
+    from utils.snapshots import get_snapshot, is_ready
+
+    if is_live(db, season):
+        if is_ready(db):
+            return get_snapshot(db)
+        with st.spinner("Preparing the league data after a restart..."):
+            return get_snapshot(db)
+    with st.spinner(f"Loading the {season.name} archive..."):
+        return _archive.get(db, season)
+
+
+def get_season_id(season: Optional[Season]) -> Optional[int]:
+    return None if season is None else season.id
+
+
+def get_season_name(season: Optional[Season]) -> str:
+    return "League" if season is None else season.name
+
+
+def select_season(db: Prisma) -> Optional[Season]:
+    seasons = get_seasons(db)
+    if len(seasons) == 0:
+        return None
+    names = [s.name for s in seasons]
+    current = get_current_season(db)
+    season_name = st.sidebar.selectbox("Season", names, index=names.index(current.name))
+    return seasons[names.index(season_name)]
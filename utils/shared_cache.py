@@ -0,0 +1,310 @@
+import io
+import json
+import os
+import re
+import struct
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import streamlit as st
+
+from utils.compact import (
+    STAT_FIELDS,
+    CompactDivision,
+    CompactGoal,
+    CompactGoalDetail,
+    CompactMatch,
+    CompactMatchDetail,
+    CompactPeriod,
+    CompactPlayer,
+    CompactPlayerStats,
+    CompactTeam,
+    intern,
+)
+
+SHARED_CACHE_URL = os.environ.get("SHARED_CACHE_URL", "")
+# Bumped when the packed layout changes, old entries are then ignored
+FORMAT_VERSION = 1
+LOCK_TIMEOUT = 120.0
+WAIT_INTERVAL = 0.2
+ENTRY_TTL = 7 * 24 * 3600
+GENERATION_KEY = "generation"
+
+
+class FileBackend:
+    def __init__(self, directory: Path):
+        self.directory = directory
+        self.directory.mkdir(parents=True, exist_ok=True)
+
+    def path(self, key: str) -> Path:
+        return self.directory / re.sub(r"[^\w.-]", "_", key)
+
+    def get(self, key: str) -> Optional[bytes]:
+        try:
+            return self.path(key).read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def put(self, key: str, value: bytes):
+        path = self.path(key)
+        tmp_path = path.with_name(f"{path.name}.{uuid.uuid4().hex}.tmp")
+        tmp_path.write_bytes(value)
+        # Atomic on the same filesystem, readers never see a partial entry
+        os.replace(tmp_path, path)
+
+    def acquire(self, key: str) -> bool:
+        lock_path = self.path(f"{key}.lock")
+        try:
+            fd = os.open(lock_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+        except FileExistsError:
+            try:
+                stale = time.time() - lock_path.stat().st_mtime > LOCK_TIMEOUT
+            except FileNotFoundError:
+                return False
+            if stale:
+                lock_path.unlink(missing_ok=True)
+            return False
+        os.close(fd)
+        return True
+
+    def release(self, key: str):
+        self.path(f"{key}.lock").unlink(missing_ok=True)
+
+    def prune(self, prefix: str, keep: str):
+        for path in self.directory.glob(f"{self.path(prefix).name}*"):
+            if path.name != self.path(keep).name and not path.name.endswith(".lock"):
+                path.unlink(missing_ok=True)
+
+
+class RedisBackend:
+    def __init__(self, url: str):
+        # Optional, only the replicas configured with Redis need the client
+        import redis
+
+        self.client = redis.Redis.from_url(url)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self.client.get(key)
+
+    def put(self, key: str, value: bytes):
+        self.client.set(key, value, ex=ENTRY_TTL)
+
+    def acquire(self, key: str) -> bool:
+        return bool(
+            self.client.set(f"{key}.lock", 1, nx=True, px=int(LOCK_TIMEOUT * 1000))
+        )
+
+    def release(self, key: str):
+        self.client.delete(f"{key}.lock")
+
+    def prune(self, prefix: str, keep: str):
+        # Old versions expire on their own
+        pass
+
+
+def get_backend(url: str):
+    if url.startswith(("redis://", "rediss://", "unix://")):
+        return RedisBackend(url)
+    return FileBackend(Path(url.removeprefix("file://")))
+
+
+class SharedCache:
+    def __init__(self, backend):
+        self.backend = backend
+        self.hits = 0
+        self.misses = 0
+
+    def generation(self) -> int:
+        value = self.backend.get(GENERATION_KEY)
+        return 0 if value is None else int(value)
+
+    def bump_generation(self):
+        self.backend.put(GENERATION_KEY, str(time.time_ns()).encode())
+
+    def key(self, name: str, *version: Any) -> str:
+        # Older versions of the same name are pruned once a newer one is stored
+        parts = [FORMAT_VERSION, self.generation(), *version]
+        return f"{name}." + "-".join(str(p) for p in parts)
+
+    def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Any],
+        dump: Callable[[Any], bytes],
+        load: Callable[[bytes], Any],
+    ):
+        data = self.backend.get(key)
+        if data is not None:
+            self.hits += 1
+            return load(data)
+
+        self.misses += 1
+        deadline = time.monotonic() + LOCK_TIMEOUT
+        # One replica computes, the others wait for its entry
+        while not self.backend.acquire(key):
+            time.sleep(WAIT_INTERVAL)
+            data = self.backend.get(key)
+            if data is not None:
+                return load(data)
+            if time.monotonic() > deadline:
+                return compute()
+        try:
+            data = self.backend.get(key)
+            if data is not None:
+                return load(data)
+            value = compute()
+            self.backend.put(key, dump(value))
+            self.backend.prune(key.rsplit(".", 1)[0] + ".", key)
+            return value
+        finally:
+            self.backend.release(key)
+
+
+@st.experimental_singleton
+def get_shared_cache() -> Optional[SharedCache]:
+    if SHARED_CACHE_URL == "":
+        return None
+    return SharedCache(get_backend(SHARED_CACHE_URL))
+
+
+def pack_frames(frames: dict) -> bytes:
+    # A JSON header with the size of each Arrow IPC table, then the tables
+    buffers = {}
+    for name, df in frames.items():
+        buffer = io.BytesIO()
+        df.write_ipc(buffer, compression="lz4")
+        buffers[name] = buffer.getvalue()
+    header = json.dumps({name: len(b) for name, b in buffers.items()}).encode()
+    return struct.pack("<I", len(header)) + header + b"".join(buffers.values())
+
+
+def unpack_frames(data: bytes) -> dict:
+    import polars as pl
+
+    (header_size,) = struct.unpack_from("<I", data)
+    offset = 4 + header_size
+    frames = {}
+    for name, size in json.loads(data[4:offset]).items():
+        frames[name] = pl.read_ipc(io.BytesIO(data[offset : offset + size]))
+        offset += size
+    return frames
+
+
+def get_columns(objects: list, fields: tuple) -> dict[str, list]:
+    return {f: [getattr(obj, f) for obj in objects] for f in fields}
+
+
+MATCH_FIELDS = (
+    "id",
+    "date",
+    "matchday",
+    "gameNumber",
+    "title",
+    "leagueDivisionId",
+    "defwin",
+    "addRed",
+    "addBlue",
+    "replayURL",
+    "version",
+)
+DETAIL_FIELDS = ("leagueMatchId", "leagueTeamId", "home", "startsRed")
+PERIOD_FIELDS = tuple(f for f in CompactPeriod.__slots__ if f != "PlayerStats")
+PLAYER_STATS_FIELDS = ("id", "periodId", "playerId") + STAT_FIELDS
+PLAYER_FIELDS = ("id", "auth", "conn", "name", "team")
+GOAL_DETAIL_FIELDS = ("goalId", "playerId", "role", "own")
+
+
+def pack_matches(matches: list[CompactMatch]) -> bytes:
+    import polars as pl
+
+    divisions = {m.LeagueDivision.id: m.LeagueDivision for m in matches}
+    details = [md for m in matches for md in m.detail]
+    teams = {md.team.id: md.team for md in details}
+    periods = [p for m in matches for p in m.periods]
+    player_stats = [ps for p in periods for ps in p.PlayerStats]
+    players = {ps.Player.id: ps.Player for ps in player_stats}
+    goal_details = [gd for p in players.values() for gd in p.goalDetail]
+    goals = {gd.goal.id: gd.goal for gd in goal_details}
+
+    # Shared rows are stored once, like the tables they were queried from
+    tables = {
+        "divisions": (list(divisions.values()), CompactDivision.__slots__),
+        "teams": (list(teams.values()), CompactTeam.__slots__),
+        "matches": (matches, MATCH_FIELDS),
+        "details": (details, DETAIL_FIELDS),
+        "periods": (periods, PERIOD_FIELDS),
+        "player_stats": (player_stats, PLAYER_STATS_FIELDS),
+        "players": (list(players.values()), PLAYER_FIELDS),
+        "goal_details": (goal_details, GOAL_DETAIL_FIELDS),
+        "goals": (list(goals.values()), CompactGoal.__slots__),
+    }
+    return pack_frames(
+        {
+            name: pl.DataFrame(get_columns(objects, fields))
+            for name, (objects, fields) in tables.items()
+        }
+    )
+
+
+def group_rows(rows: list[dict], key: str) -> dict[Any, list[dict]]:
+    groups: dict[Any, list[dict]] = {}
+    for row in rows:
+        groups.setdefault(row[key], []).append(row)
+    return groups
+
+
+def intern_rows(rows: list[dict], fields: tuple) -> list[dict]:
+    for row in rows:
+        for f in fields:
+            row[f] = intern(row[f])
+    return rows
+
+
+def unpack_matches(data: bytes) -> list[CompactMatch]:
+    rows = {name: df.to_dicts() for name, df in unpack_frames(data).items()}
+    intern_rows(rows["divisions"], ("name",))
+    intern_rows(rows["teams"], ("name", "initials"))
+    intern_rows(rows["players"], ("auth", "conn", "name"))
+    intern_rows(rows["matches"], ("matchday",))
+
+    divisions = {r["id"]: CompactDivision(**r) for r in rows["divisions"]}
+    teams = {r["id"]: CompactTeam(**r) for r in rows["teams"]}
+    goals = {r["id"]: CompactGoal(**r) for r in rows["goals"]}
+    goal_details = group_rows(rows["goal_details"], "playerId")
+    players = {
+        r["id"]: CompactPlayer(
+            **r,
+            goalDetail=tuple(
+                CompactGoalDetail(goal=goals[gd["goalId"]], **gd)
+                for gd in goal_details.get(r["id"], [])
+            ),
+        )
+        for r in rows["players"]
+    }
+    player_stats = group_rows(rows["player_stats"], "periodId")
+    periods = group_rows(rows["periods"], "leagueMatchId")
+    details = group_rows(rows["details"], "leagueMatchId")
+
+    return [
+        CompactMatch(
+            **r,
+            LeagueDivision=divisions[r["leagueDivisionId"]],
+            periods=[
+                CompactPeriod(
+                    **p,
+                    PlayerStats=tuple(
+                        CompactPlayerStats(Player=players[ps["playerId"]], **ps)
+                        for ps in player_stats.get(p["id"], [])
+                    ),
+                )
+                for p in periods.get(r["id"], [])
+            ],
+            detail=[
+                CompactMatchDetail(team=teams[md["leagueTeamId"]], **md)
+                for md in details.get(r["id"], [])
+            ],
+        )
+        for r in rows["matches"]
+    ]
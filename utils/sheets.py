@@ -0,0 +1,79 @@
+import threading
+from dataclasses import replace
+from typing import Iterable, Optional
+
+import streamlit as st
+from prisma.models import LeagueMatch, LeaguePlayer
+
+from utils.utils import (
+    PlayerStatSheet,
+    get_nick_index,
+    get_statsheet_list,
+    resolve_player_name,
+)
+
+
+def get_raw_name(sheet: PlayerStatSheet) -> str:
+    return sheet.stats.Player.name.strip().lower()
+
+
+class StatSheetStore:
+    def __init__(self):
+        self._sheets: dict[int, tuple[LeagueMatch, list[PlayerStatSheet]]] = {}
+        self._names: dict[str, set[int]] = {}
+        self._lock = threading.Lock()
+
+    def get(
+        self,
+        match: LeagueMatch,
+        players: list[LeaguePlayer],
+        nick_index: Optional[dict[str, LeaguePlayer]] = None,
+    ) -> list[PlayerStatSheet]:
+        with self._lock:
+            cached = self._sheets.get(match.id)
+        # A refreshed match is a new object, its sheets are rebuilt
+        if cached is not None and cached[0] is match:
+            return cached[1]
+
+        sheets = get_statsheet_list(players, match, nick_index)
+        with self._lock:
+            self._sheets[match.id] = (match, sheets)
+            for sheet in sheets:
+                self._names.setdefault(get_raw_name(sheet), set()).add(match.id)
+        return sheets
+
+    def get_many(
+        self, matches: Iterable[LeagueMatch], players: list[LeaguePlayer]
+    ) -> list[PlayerStatSheet]:
+        nick_index = get_nick_index(players)
+        sheets = []
+        for match in matches:
+            sheets.extend(self.get(match, players, nick_index))
+        return sheets
+
+    def reresolve(self, nicks: Iterable[str], players: list[LeaguePlayer]) -> int:
+        names = {n.strip().lower() for n in nicks}
+        nick_index = get_nick_index(players)
+        nb_sheets = 0
+        with self._lock:
+            match_ids = set().union(*[self._names.get(n, set()) for n in names])
+            for match_id in match_ids:
+                match, sheets = self._sheets[match_id]
+                # New sheets in a new list, snapshots and cached statistics
+                # built from the previous ones keep reading them unchanged
+                fresh = []
+                for sheet in sheets:
+                    if get_raw_name(sheet) in names:
+                        player, player_name = resolve_player_name(
+                            nick_index, sheet.stats.Player.name
+                        )
+                        sheet = replace(sheet, player=player, player_name=player_name)
+                        nb_sheets += 1
+                    fresh.append(sheet)
+                self._sheets[match_id] = (match, fresh)
+        return nb_sheets
+
+
+@st.experimental_singleton
+def get_sheet_store() -> StatSheetStore:
+    return StatSheetStore()
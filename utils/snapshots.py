@@ -0,0 +1,291 @@
+import hashlib
+import threading
+import time
+import traceback
+import weakref
+from dataclasses import dataclass, replace
+from types import MappingProxyType
+from typing import Callable, Mapping, Optional
+
+import pandas as pd
+import polars as pl
+import streamlit as st
+from prisma import Prisma
+from prisma.models import LeagueDivision, LeagueMatch, LeaguePlayer, LeagueTeam
+
+from utils.data import (
+    get_current_season_id,
+    get_data_version,
+    get_players_version,
+    get_divisions,
+    get_matches,
+    get_players,
+    get_season_divisions,
+    get_teams,
+)
+from utils.league_calendar import LeagueCalendar
+from utils.metrics import timed
+from utils.shared_cache import get_shared_cache, pack_frames, unpack_frames
+from utils.standings import build_match_db
+from utils.stats import StatsResult, compute_stats
+from utils.summary import MatchSummary, build_match_summary
+
+POLL_INTERVAL = 1.0
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    data_version: int
+    players_version: int
+    # Same data, same digest, on every replica and after a restart
+    digest: str
+    created_at: float
+    build_time: float
+    calendar: LeagueCalendar
+    summary: MatchSummary
+    standings: Mapping[tuple, pd.DataFrame]
+    stats: Mapping[tuple, StatsResult]
+
+    @property
+    def version(self) -> tuple[int, int]:
+        return self.data_version, self.players_version
+
+
+def get_default_stats_key(calendar: LeagueCalendar, division_id: int) -> tuple:
+    # Filters of 4_Statistics before any widget is changed
+    matchdays = (0, calendar.last_played(division_id))
+    return (division_id, None, matchdays, False, False, None)
+
+
+def get_default_standings_key(calendar: LeagueCalendar, division_id: int) -> tuple:
+    return (division_id, (0, max(0, len(calendar.matchdays(division_id)) - 1)))
+
+
+def build_standings(
+    calendar: LeagueCalendar, divisions: list[LeagueDivision]
+) -> dict[tuple, pd.DataFrame]:
+    standings = {}
+    for division in divisions:
+        key = get_default_standings_key(calendar, division.id)
+        standings[key] = build_match_db(calendar, division, key[1])
+    return standings
+
+
+def pack_standings(standings: dict[tuple, pd.DataFrame]) -> bytes:
+    return pack_frames(
+        {
+            f"{div_id}:{first}:{last}": pl.from_pandas(df)
+            for (div_id, (first, last)), df in standings.items()
+        }
+    )
+
+
+def unpack_standings(data: bytes) -> dict[tuple, pd.DataFrame]:
+    standings = {}
+    for name, df in unpack_frames(data).items():
+        div_id, first, last = (int(v) for v in name.split(":"))
+        standings[(div_id, (first, last))] = df.to_pandas()
+    return standings
+
+
+def get_matches_digest(matches: list[LeagueMatch]) -> str:
+    # Every edit bumps the match version, local ones included
+    versions = ",".join(f"{m.id}:{m.version}" for m in matches)
+    return hashlib.sha1(versions.encode()).hexdigest()[:20]
+
+
+def get_content_digest(
+    matches: list[LeagueMatch],
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+) -> str:
+    parts = [get_matches_digest(matches)]
+    for t in teams:
+        members = sorted((tp.leaguePlayerId, tp.active) for tp in t.players or [])
+        parts.append(f"{t.id}:{t.name}:{t.initials}:{t.leagueDivisionId}:{members}")
+    for p in players:
+        parts.append(f"{p.id}:{p.name}:{p.nicks}")
+    return hashlib.sha1("\n".join(parts).encode()).hexdigest()[:20]
+
+
+def build_default_stats(
+    calendar: LeagueCalendar,
+    divisions: list[LeagueDivision],
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+) -> dict[tuple, StatsResult]:
+    # Statistics keep their period sheets, they are built on each replica
+    stats = {}
+    for division in divisions:
+        stats_key = get_default_stats_key(calendar, division.id)
+        stats[stats_key] = compute_stats(
+            calendar, teams, players, division, None, stats_key[2], False, False, None
+        )
+    return stats
+
+
+def build_season_snapshot(
+    matches: list[LeagueMatch],
+    divisions: list[LeagueDivision],
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+    version: tuple[int, int],
+    shared_name: Optional[str] = None,
+    shared_version: tuple = (),
+) -> Snapshot:
+    start = time.perf_counter()
+    calendar = LeagueCalendar(matches)
+
+    shared = get_shared_cache() if shared_name is not None else None
+    if shared is None:
+        standings = build_standings(calendar, divisions)
+    else:
+        # Standings only depend on the matches, replicas share them per version
+        standings = shared.get_or_compute(
+            shared.key(shared_name, *shared_version),
+            lambda: build_standings(calendar, divisions),
+            pack_standings,
+            unpack_standings,
+        )
+
+    stats = build_default_stats(calendar, divisions, teams, players)
+
+    return Snapshot(
+        data_version=version[0],
+        players_version=version[1],
+        digest=get_content_digest(matches, teams, players),
+        created_at=time.time(),
+        build_time=time.perf_counter() - start,
+        calendar=calendar,
+        summary=build_match_summary(matches),
+        standings=MappingProxyType(standings),
+        stats=MappingProxyType(stats),
+    )
+
+
+def update_snapshot_players(
+    db: Prisma, snapshot: Snapshot, players_version: int
+) -> Snapshot:
+    # Only the player names or the rosters changed, the match views are kept
+    start = time.perf_counter()
+    divisions = get_season_divisions(get_divisions(db), get_current_season_id(db))
+    matches = list(snapshot.calendar.matches_by_id.values())
+    teams, players = get_teams(db), get_players(db)
+    stats = build_default_stats(snapshot.calendar, divisions, teams, players)
+    return replace(
+        snapshot,
+        players_version=players_version,
+        digest=get_content_digest(matches, teams, players),
+        created_at=time.time(),
+        build_time=time.perf_counter() - start,
+        stats=MappingProxyType(stats),
+    )
+
+
+def build_snapshot(db: Prisma, version: tuple[int, int]) -> Snapshot:
+    season_id = get_current_season_id(db)
+    divisions = get_season_divisions(get_divisions(db), season_id)
+    matches = get_matches(db)
+    return build_season_snapshot(
+        matches,
+        divisions,
+        get_teams(db),
+        get_players(db),
+        version,
+        f"standings-{season_id}",
+        (get_matches_digest(matches),),
+    )
+
+
+class SnapshotPublisher:
+    def __init__(
+        self,
+        build: Callable[[tuple[int, int]], Snapshot],
+        update_players: Callable[[Snapshot, int], Snapshot],
+        get_version: Callable[[], tuple[int, int]],
+        interval: float = POLL_INTERVAL,
+    ):
+        self._build = build
+        self._update_players = update_players
+        self._get_version = get_version
+        self._interval = interval
+        self._latest: Optional[Snapshot] = None
+        self._build_lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def latest(self) -> Optional[Snapshot]:
+        return self._latest
+
+    def start(self):
+        if self._thread is None:
+            self._thread = threading.Thread(
+                target=run_publisher,
+                args=(weakref.ref(self),),
+                name="snapshot-publisher",
+                daemon=True,
+            )
+            self._thread.start()
+
+    def notify(self):
+        self._wakeup.set()
+
+    def publish(self) -> Snapshot:
+        with self._build_lock:
+            version = self._get_version()
+            latest = self._latest
+            if latest is not None and latest.version == version:
+                return latest
+            if latest is not None and latest.data_version == version[0]:
+                with timed("snapshot.update_players"):
+                    snapshot = self._update_players(latest, version[1])
+            else:
+                with timed("snapshot.build"):
+                    snapshot = self._build(version)
+            # A single reference swap, readers see the old or the new snapshot
+            self._latest = snapshot
+            return snapshot
+
+
+def run_publisher(publisher_ref: weakref.ref):
+    # Only a weak reference is kept, so the thread ends once the singleton
+    # holding the publisher is cleared
+    while (publisher := publisher_ref()) is not None:
+        try:
+            publisher.publish()
+        except Exception:
+            traceback.print_exc()
+        wakeup, interval = publisher._wakeup, publisher._interval
+        del publisher
+        wakeup.wait(interval)
+        wakeup.clear()
+
+
+@st.experimental_singleton
+def get_snapshot_publisher(_db: Prisma) -> SnapshotPublisher:
+    publisher = SnapshotPublisher(
+        lambda version: build_snapshot(_db, version),
+        lambda snapshot, version: update_snapshot_players(_db, snapshot, version),
+        lambda: (get_data_version(_db), get_players_version(_db)),
+    )
+    publisher.start()
+    return publisher
+
+
+def start_prewarm(db: Prisma) -> SnapshotPublisher:
+    # The publisher builds the default views right away in its own thread,
+    # so the first visitors after a deploy find them ready
+    return get_snapshot_publisher(db)
+
+
+def is_ready(db: Prisma) -> bool:
+    return get_snapshot_publisher(db).latest() is not None
+
+
+def get_snapshot(db: Prisma) -> Snapshot:
+    publisher = get_snapshot_publisher(db)
+    snapshot = publisher.latest()
+    if snapshot is None:
+        # Only the first visitor after a start waits for a snapshot
+        snapshot = publisher.publish()
+    return snapshot
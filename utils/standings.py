@@ -0,0 +1,104 @@
+from dataclasses import dataclass
+
+import pandas as pd
+from prisma.models import LeagueDivision, LeagueMatch, LeagueTeam
+
+from utils.league_calendar import LeagueCalendar
+from utils.utils import get_info_match
+
+
+@dataclass
+class StandingTeam:
+    name: str
+    games: int
+    wins: int
+    draws: int
+    losses: int
+    defwins: int
+    goals_scored: int
+    goals_conceded: int
+
+    @property
+    def points(self):
+        return 3 * self.wins + self.draws
+
+    @property
+    def differential(self):
+        return self.goals_scored - self.goals_conceded
+
+
+def build_match_db_team(match_list: list[LeagueMatch], team: LeagueTeam):
+    standing_team = StandingTeam(
+        name=team.name,
+        games=0,
+        wins=0,
+        draws=0,
+        losses=0,
+        defwins=0,
+        goals_scored=0,
+        goals_conceded=0,
+    )
+    for m in match_list:
+        info_match = get_info_match(m)
+        if info_match.score[0] == -1 or len(m.detail) < 2:
+            continue
+        if m.detail[0].team.name != team.name and m.detail[1].team.name != team.name:
+            continue
+
+        standing_team.games += 1
+        if m.detail[1].team.id == team.id:
+            score_team = info_match.score[1]
+            score_opponent = info_match.score[0]
+            if m.defwin == 1:
+                standing_team.defwins += 1
+        else:
+            score_team = info_match.score[0]
+            score_opponent = info_match.score[1]
+            if m.defwin == 2:
+                standing_team.defwins += 1
+
+        if score_team > score_opponent:
+            standing_team.wins += 1
+        elif score_team == score_opponent:
+            standing_team.draws += 1
+        else:
+            standing_team.losses += 1
+
+        standing_team.goals_scored += score_team
+        standing_team.goals_conceded += score_opponent
+
+    return standing_team
+
+
+def build_match_db(
+    calendar: LeagueCalendar,
+    division: LeagueDivision,
+    matchdays_select: tuple[int],
+):
+    match_ids = calendar.matches_in_range(division.id, *matchdays_select)
+    match_list = calendar.get_matches(match_ids)
+    standings = []
+    for team in division.teams:
+        standing = build_match_db_team(match_list, team)
+        obj_standing = {
+            "team": standing.name,
+            "GP": standing.games,
+            "W": standing.wins,
+            "D": standing.draws,
+            "L": standing.losses,
+            "PTS": standing.points,
+            "DEF": standing.defwins,
+            "GF": standing.goals_scored,
+            "GA": standing.goals_conceded,
+            "DIFF": standing.differential,
+        }
+        standings.append(obj_standing)
+    standings_df = pd.DataFrame(
+        [
+            dict(s)
+            for s in sorted(
+                standings, key=lambda s: (s["PTS"], s["DIFF"], s["GF"]), reverse=True
+            )
+        ]
+    )
+    return standings_df
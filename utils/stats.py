@@ -0,0 +1,275 @@
+import math
+from dataclasses import dataclass
+from typing import Callable, Optional
+
+import polars as pl
+from prisma.models import LeagueDivision, LeagueMatch, LeaguePlayer, LeagueTeam
+
+from utils.league_calendar import LeagueCalendar
+from utils.metrics import timed
+from utils.sheets import get_sheet_store
+from utils.utils import (
+    PlayerStatSheet,
+    display_gametime,
+    display_pass_success,
+    display_position,
+    display_stat,
+)
+
+NORMALIZE_GAMETIME = 14 * 60
+MAX_PERIOD_GAMETIME = 7 * 60
+
+
+@dataclass(frozen=True)
+class StatDefinition:
+    name: str
+    label: str
+    source: str
+    aggregation: str = "sum"
+    normalizable: bool = True
+    formatter: Optional[Callable] = display_stat
+    card: bool = True
+    ratio_of: Optional[str] = None
+
+
+STATS: tuple[StatDefinition, ...] = (
+    StatDefinition(
+        "gamePosition",
+        "Position",
+        "gamePosition",
+        aggregation="mode",
+        normalizable=False,
+        formatter=display_position,
+    ),
+    StatDefinition(
+        "gametime",
+        "Gametime",
+        "gametime",
+        normalizable=False,
+        formatter=display_gametime,
+    ),
+    StatDefinition("goals", "Goals", "goals"),
+    StatDefinition("assists", "Assists", "assists"),
+    StatDefinition("cs", "CS", "cs"),
+    StatDefinition("saves", "Saves", "saves"),
+    StatDefinition("ownGoals", "Own goals", "ownGoals"),
+    StatDefinition("passes", "Passes", "passesAttempted"),
+    StatDefinition(
+        "passSuccess",
+        "Pass success %",
+        "passesSuccessful",
+        normalizable=False,
+        formatter=display_pass_success,
+        ratio_of="passesAttempted",
+    ),
+    StatDefinition("shots", "Shots", "shots"),
+    StatDefinition("shotsTarget", "Shots (T)", "shotsTarget"),
+    StatDefinition("touches", "Touches", "touches"),
+    StatDefinition("kicks", "Kicks", "kicks"),
+    StatDefinition("assists_2", "Assists (2)", "secondaryAssists"),
+    StatDefinition("assists_3", "Assists (3)", "tertiaryAssists"),
+    StatDefinition("rebounds", "Rebounds", "reboundDribbles"),
+    StatDefinition("duels", "Duels", "duels", card=False),
+    StatDefinition("interceptions", "Interceptions", "interceptions", card=False),
+    StatDefinition("clears", "Clears", "clears", card=False),
+    StatDefinition(
+        "averagePosX",
+        "Average X",
+        "averagePosX",
+        aggregation="mean",
+        normalizable=False,
+        formatter=None,
+        card=False,
+    ),
+)
+
+CARD_STATS = tuple(s for s in STATS if s.card)
+
+
+def get_source_columns() -> dict[str, str]:
+    sources = {}
+    for stat in STATS:
+        sources.setdefault(stat.source, stat.aggregation)
+        if stat.ratio_of is not None:
+            sources.setdefault(stat.ratio_of, "sum")
+    return sources
+
+
+def sheet_value(sheet: PlayerStatSheet, source: str):
+    if source == "cs":
+        return sheet.cs
+    return getattr(sheet.stats, source)
+
+
+def period_value(sheet: PlayerStatSheet, source: str):
+    # Same per-period adjustments as sum_sheets
+    if source == "gametime":
+        return min(sheet.stats.gametime, MAX_PERIOD_GAMETIME)
+    if source == "averagePosX" and sheet.period_team != 1:
+        return -sheet.stats.averagePosX
+    return sheet_value(sheet, source)
+
+
+def stat_value(stat: StatDefinition, sheet: PlayerStatSheet):
+    value = sheet_value(sheet, stat.source)
+    if stat.ratio_of is None:
+        return value
+    total = sheet_value(sheet, stat.ratio_of)
+    return value / total if total else math.nan
+
+
+def format_stat(stat: StatDefinition, value) -> str:
+    if stat.formatter is None:
+        return f"{value}"
+    return stat.formatter(value)
+
+
+def build_period_frame(period_sheets: list[PlayerStatSheet]) -> pl.DataFrame:
+    sources = get_source_columns()
+    data = {"name": [pss.player_name for pss in period_sheets]}
+    for source in sources:
+        data[source] = [period_value(pss, source) for pss in period_sheets]
+    return pl.DataFrame(data)
+
+
+def compile_aggregation() -> list[pl.Expr]:
+    exprs = []
+    for source, aggregation in get_source_columns().items():
+        if aggregation == "sum":
+            exprs.append(pl.col(source).sum())
+        elif aggregation == "mean":
+            exprs.append(pl.col(source).mean())
+        elif aggregation == "mode":
+            # First seen of the most frequent values, like statistics.mode
+            values = pl.col(source).unique(maintain_order=True)
+            exprs.append(values.take(pl.col(source).unique_counts().arg_max()))
+        else:
+            raise ValueError(f"Unknown aggregation {aggregation} for {source}")
+    return exprs
+
+
+def compile_shared() -> list[pl.Expr]:
+    gametime = pl.col("gametime").floor().cast(pl.Int64)
+    return [
+        gametime.alias("gametime"),
+        (gametime / NORMALIZE_GAMETIME).alias("_gametime_14"),
+    ]
+
+
+def compile_stat(stat: StatDefinition, normalized: bool) -> pl.Expr:
+    expr = pl.col(stat.source)
+    if stat.ratio_of is not None:
+        expr = expr / pl.col(stat.ratio_of)
+    if normalized and stat.normalizable:
+        expr = expr / pl.col("_gametime_14")
+    return expr.alias(stat.name)
+
+
+def compile_plan(normalized: bool) -> list[pl.Expr]:
+    return [pl.col("name")] + [compile_stat(s, normalized) for s in STATS]
+
+
+def build_stats_table(
+    period_sheets: list[PlayerStatSheet],
+    normalized: bool,
+) -> pl.DataFrame:
+    if len(period_sheets) == 0:
+        return pl.DataFrame()
+    return (
+        build_period_frame(period_sheets)
+        .lazy()
+        .groupby("name")
+        .agg(compile_aggregation())
+        .with_columns(compile_shared())
+        .select(compile_plan(normalized))
+        .sort("name")
+        .collect()
+    )
+
+
+def style_stats(styler):
+    for stat in STATS:
+        if stat.formatter is not None:
+            styler.format(subset=[stat.name], formatter=stat.formatter)
+    return styler
+
+
+def filter_matches(
+    calendar: LeagueCalendar,
+    team_name: Optional[str],
+    division: LeagueDivision,
+    matchdays_select: tuple[int],
+):
+    match_ids = calendar.matches_in_range(division.id, *matchdays_select)
+    match_list_filter = []
+    for m in calendar.get_matches(match_ids):
+        if team_name is None or any([md.team.name == team_name for md in m.detail]):
+            match_list_filter.append(m)
+    return match_list_filter
+
+
+def get_stats(
+    matches: list[LeagueMatch],
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+    div_select: LeagueDivision,
+    team_name_select: Optional[str],
+):
+    period_sheets = get_sheet_store().get_many(matches, players)
+
+    players_stats: list[LeaguePlayer] = []
+    for team in teams:
+        if team.division.id == div_select.id:
+            if team_name_select is None or (
+                team_name_select is not None and team.name == team_name_select
+            ):
+                active_players = [p.player for p in team.players if p.active]
+                players_stats.extend(active_players)
+    players_stats_id = [p.id for p in players_stats]
+
+    player_sheets_final = [
+        ps
+        for ps in period_sheets
+        if ps.player is not None and ps.player.id in players_stats_id
+    ]
+
+    return player_sheets_final
+
+
+@dataclass
+class StatsResult:
+    table: pl.DataFrame
+    period_sheets: list[PlayerStatSheet]
+
+
+def compute_stats(
+    calendar: LeagueCalendar,
+    teams: list[LeagueTeam],
+    players: list[LeaguePlayer],
+    div_select: LeagueDivision,
+    team_name_select: Optional[str],
+    matchdays_select: tuple[int],
+    normalized: bool,
+    filter_players: bool,
+    filter_position: Optional[int],
+):
+    match_list_filter = filter_matches(
+        calendar, team_name_select, div_select, matchdays_select
+    )
+    with timed("statistics.resolve", rows=len(match_list_filter)):
+        period_sheets = get_stats(
+            match_list_filter,
+            teams,
+            players,
+            div_select,
+            team_name_select,
+        )
+    with timed("statistics.aggregate", rows=len(period_sheets)):
+        df = build_stats_table(period_sheets, normalized)
+    if len(df) == 0:
+        return StatsResult(df, period_sheets)
+    if filter_players:
+        df = df.filter(pl.col("gametime") >= 14 * 60)
+    if filter_position is not None:
+        df = df.filter(pl.col("gamePosition") == filter_position)
+    return StatsResult(df, period_sheets)
@@ -0,0 +1,80 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import polars as pl
+from prisma.models import LeagueMatch
+
+from utils.utils import get_info_match, is_match_played
+
+SUMMARY_COLUMNS = ["division", "matchday", "date", "team1", "team2", "score"]
+
+
+@dataclass
+class MatchSummary:
+    table: pl.DataFrame
+    by_division: dict[int, list[int]]
+    by_team: dict[str, set[int]]
+    by_matchday: dict[tuple[int, str], set[int]]
+
+    def lookup(
+        self,
+        division_id: int,
+        team_name: Optional[str] = None,
+        matchday: Optional[str] = None,
+    ) -> pl.DataFrame:
+        rows = self.by_division.get(division_id, [])
+        if team_name is not None:
+            team_rows = self.by_team.get(team_name, set())
+            rows = [r for r in rows if r in team_rows]
+        if matchday is not None:
+            md_rows = self.by_matchday.get((division_id, matchday), set())
+            rows = [r for r in rows if r in md_rows]
+        if len(rows) == 0:
+            return self.table.slice(0, 0)
+        return self.table[rows]
+
+
+def build_match_summary(matches: list[LeagueMatch]) -> MatchSummary:
+    data = {
+        "id": [],
+        "divisionId": [],
+        "division": [],
+        "matchday": [],
+        "date": [],
+        "team1": [],
+        "team2": [],
+        "score1": [],
+        "score2": [],
+        "score": [],
+        "played": [],
+        "defwin": [],
+    }
+    by_division: dict[int, list[int]] = {}
+    by_team: dict[str, set[int]] = {}
+    by_matchday: dict[tuple[int, str], set[int]] = {}
+    for i, m in enumerate(matches):
+        info_match = get_info_match(m)
+        team1 = m.detail[0].team.name if len(m.detail) > 0 else ""
+        team2 = m.detail[1].team.name if len(m.detail) > 1 else ""
+        score = f"{info_match.score[0]}-{info_match.score[1]}"
+        if info_match.score[0] == -1:
+            score = ""
+        data["id"].append(m.id)
+        data["divisionId"].append(m.leagueDivisionId)
+        data["division"].append(m.LeagueDivision.name)
+        data["matchday"].append(m.matchday)
+        data["date"].append(m.date)
+        data["team1"].append(team1)
+        data["team2"].append(team2)
+        data["score1"].append(info_match.score[0])
+        data["score2"].append(info_match.score[1])
+        data["score"].append(score)
+        data["played"].append(is_match_played(m))
+        data["defwin"].append(m.defwin)
+
+        by_division.setdefault(m.leagueDivisionId, []).append(i)
+        by_matchday.setdefault((m.leagueDivisionId, m.matchday), set()).add(i)
+        for md in m.detail:
+            by_team.setdefault(md.team.name, set()).add(i)
+
+    return MatchSummary(pl.DataFrame(data), by_division, by_team, by_matchday)
@@ -0,0 +1,98 @@
+from dataclasses import dataclass
+from enum import IntEnum
+from typing import Optional
+
+import streamlit as st
+from prisma.models import LeagueMatch, LeaguePlayer, LeagueTeam
+
+from utils.cache import LRUCache
+from utils.utils import get_nick_index, get_period_team, resolve_player_name
+
+
+class GoalRole(IntEnum):
+    unknown = 0
+    scorer = 1
+    assist = 2
+    secondaryAssist = 3
+    tertiaryAssist = 4
+
+
+@dataclass
+class GoalEvent:
+    period: int
+    time: float
+    team: LeagueTeam
+    scorer: Optional[str]
+    assist: Optional[str]
+    secondary_assist: Optional[str]
+    tertiary_assist: Optional[str]
+    own_goal: bool
+    passes: int
+    score: tuple
+
+
+def get_goal_timeline(match: LeagueMatch, players: list[LeaguePlayer]):
+    if len(match.detail) < 2:
+        return []
+    nick_index = get_nick_index(players)
+    team_1 = match.detail[0].team
+    events: list[GoalEvent] = []
+    time_offset = 0.0
+    for i, period in enumerate(match.periods):
+        goals = {}
+        for ps in period.PlayerStats:
+            player_name = resolve_player_name(nick_index, ps.Player.name)[1]
+            side = ps.Player.team
+            for gd in ps.Player.goalDetail or []:
+                goal_roles = goals.setdefault(gd.goalId, (gd.goal, {}))[1]
+                goal_roles[gd.role] = (player_name, side, gd.own)
+
+        period_events = []
+        for goal, roles in goals.values():
+            if GoalRole.scorer not in roles:
+                continue
+            scorer, side, own = roles[GoalRole.scorer]
+            if own:
+                side = 2 if side == 1 else 1
+            period_events.append(
+                GoalEvent(
+                    period=i + 1,
+                    time=time_offset + goal.time,
+                    team=get_period_team(match, i, side),
+                    scorer=scorer,
+                    assist=roles.get(GoalRole.assist, (None,))[0],
+                    secondary_assist=roles.get(GoalRole.secondaryAssist, (None,))[0],
+                    tertiary_assist=roles.get(GoalRole.tertiaryAssist, (None,))[0],
+                    own_goal=own,
+                    passes=goal.passes,
+                    score=(0, 0),
+                )
+            )
+        period_events.sort(key=lambda e: e.time)
+        events.extend(period_events)
+        time_offset += period.gametime
+
+    score_1, score_2 = 0, 0
+    for event in events:
+        if event.team.id == team_1.id:
+            score_1 += 1
+        else:
+            score_2 += 1
+        event.score = (score_1, score_2)
+    return events
+
+
+@st.experimental_singleton
+def get_timeline_cache() -> LRUCache:
+    return LRUCache(maxsize=256)
+
+
+def get_goal_timeline_cached(
+    match: LeagueMatch,
+    players: list[LeaguePlayer],
+    version: tuple[int, int],
+):
+    return get_timeline_cache().get_or_compute(
+        (match.id, version),
+        lambda: get_goal_timeline(match, players),
+    )
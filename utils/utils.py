@@ -6,7 +6,14 @@ from statistics import mode
 from typing import Literal, Optional
 
 import streamlit as st
-from prisma.models import LeagueMatch, LeaguePlayer, Period, PlayerStats
+from prisma.models import (
+    LeagueMatch,
+    LeagueMatchDetail,
+    LeaguePlayer,
+    LeagueTeam,
+    Period,
+    PlayerStats,
+)
 
 
 class GamePosition(IntEnum):
@@ -79,6 +86,75 @@ def is_match_played(match: LeagueMatch):
     return False
 
 
+@dataclass
+class MatchDetailView:
+    team: LeagueTeam
+    leagueTeamId: int
+    home: bool
+    startsRed: bool
+
+
+class MatchPeriodView:
+    def __init__(self, match: LeagueMatch, period_index: Optional[int] = None):
+        self.match = match
+        self.period_index = period_index
+
+    def __getattr__(self, name: str):
+        return getattr(self.match, name)
+
+    @property
+    def periods(self) -> list[Period]:
+        if self.period_index is None:
+            return self.match.periods
+        return [self.match.periods[self.period_index]]
+
+    @property
+    def detail(self) -> list[LeagueMatchDetail]:
+        # Sides swap every period, so odd periods start with the other team in red
+        if self.period_index is None or self.period_index % 2 == 0:
+            return self.match.detail
+        return [
+            MatchDetailView(d.team, d.leagueTeamId, d.home, not d.startsRed)
+            for d in self.match.detail
+        ]
+
+    @property
+    def addRed(self) -> int:
+        return self.match.addRed if self.period_index is None else 0
+
+    @property
+    def addBlue(self) -> int:
+        return self.match.addBlue if self.period_index is None else 0
+
+
+def get_period_views(match: LeagueMatch) -> list[MatchPeriodView]:
+    return [MatchPeriodView(match, i) for i in range(len(match.periods))]
+
+
+def get_period_team(match: LeagueMatch, period_index: int, side: Literal[1, 2]):
+    detail_1, detail_2 = match.detail[0], match.detail[1]
+    first_red = detail_1.startsRed == (period_index % 2 == 0)
+    if side == 1:
+        return detail_1.team if first_red else detail_2.team
+    return detail_2.team if first_red else detail_1.team
+
+
+def get_nick_index(players: list[LeaguePlayer]) -> dict[str, LeaguePlayer]:
+    nick_index: dict[str, LeaguePlayer] = {}
+    for p in players:
+        for n in p.nicks:
+            nick_index.setdefault(n.lower(), p)
+    return nick_index
+
+
+def resolve_player_name(nick_index: dict[str, LeaguePlayer], name: str):
+    lp_name = name.strip().lower()
+    lp = nick_index.get(lp_name)
+    if lp is None:
+        return None, f"{lp_name} (unknown)"
+    return lp, lp.name
+
+
 @dataclass
 class PlayerStatSheet:
     player: Optional[LeaguePlayer]
@@ -89,53 +165,28 @@ class PlayerStatSheet:
     cs: int
 
 
-def get_statsheet_list(players: list[LeaguePlayer], match: LeagueMatch):
+def get_statsheet_list(
+    players: list[LeaguePlayer],
+    match: LeagueMatch,
+    nick_index: Optional[dict[str, LeaguePlayer]] = None,
+):
     if len(match.detail) < 2:
         return []
-    detail_1, detail_2 = match.detail[0], match.detail[1]
+    if nick_index is None:
+        nick_index = get_nick_index(players)
     ps_list: list[PlayerStatSheet] = []
     for i, period in enumerate(match.periods):
         period_stats: Period = period
         for ps in period_stats.PlayerStats:
-            pname_period = ps.Player.name
-            if ps.Player.team == 1:
-                lp_name = pname_period.strip().lower()
-                if i % 2 == 0:
-                    team = detail_1.team if detail_1.startsRed else detail_2.team
-                else:
-                    team = detail_2.team if detail_1.startsRed else detail_1.team
-                lp_list = [
-                    p for p in players if lp_name in [n.lower() for n in p.nicks]
-                ]
-                if len(lp_list) > 0:
-                    lp = lp_list[0]
-                    lp_name = lp.name
-                else:
-                    lp = None
-                    lp_name = f"{lp_name} (unknown)"
-                stat_sheet = PlayerStatSheet(
-                    lp, lp_name, team, 1, ps, getCS(ps, period, 1)
-                )
-                ps_list.append(stat_sheet)
-            elif ps.Player.team == 2:
-                lp_name = pname_period.strip().lower()
-                if i % 2 == 0:
-                    team = detail_2.team if detail_1.startsRed else detail_1.team
-                else:
-                    team = detail_1.team if detail_1.startsRed else detail_2.team
-                lp_list = [
-                    p for p in players if lp_name in [n.lower() for n in p.nicks]
-                ]
-                if len(lp_list) > 0:
-                    lp = lp_list[0]
-                    lp_name = lp.name
-                else:
-                    lp = None
-                    lp_name = f"{lp_name} (unknown)"
-                stat_sheet = PlayerStatSheet(
-                    lp, lp_name, team, 2, ps, getCS(ps, period, 2)
-                )
-                ps_list.append(stat_sheet)
+            side = ps.Player.team
+            if side not in (1, 2):
+                continue
+            team = get_period_team(match, i, side)
+            lp, lp_name = resolve_player_name(nick_index, ps.Player.name)
+            stat_sheet = PlayerStatSheet(
+                lp, lp_name, team, side, ps, getCS(ps, period, side)
+            )
+            ps_list.append(stat_sheet)
     return ps_list
 
 
@@ -240,3 +291,13 @@ def display_pass_success(v):
     if math.isnan(v):
         return "0.0%"
     return f"{100 * v:.1f}%"
+
+
+def display_stat(v):
+    if isinstance(v, int):
+        return f"{v}"
+    return f"{v:.2f}"
+
+
+def display_position(v):
+    return GamePosition(v).name